@@ -0,0 +1,91 @@
+# benchmarks/llm_load_test.py
+"""
+Concurrency scaling of an endpoint under load, e.g. the RAG backend wired to the mock LLM.
+
+    python -m backend.benchmarks.mock_llm_server --latency-ms 800 &
+    GROQ_ENDPOINT=http://127.0.0.1:8900/openai/v1/responses GROQ_API_KEY=test \\
+    LLM_RPM_LIMIT=0 LLM_TPM_LIMIT=0 SEMANTIC_CACHE_THRESHOLD=2 \\
+        uvicorn backend.main:app --port 8000 &
+    python -m backend.benchmarks.llm_load_test --url http://127.0.0.1:8000/query_llm_api \\
+        --form api_key=kn_xxx --form "query=What is this document about?" --levels 1 4 16 64
+
+For each concurrency level it sends `level * --rounds` requests with `level`
+in flight and prints throughput and latency percentiles. Every request gets
+its own question (the `--vary` field with the request number appended), so
+identical in-flight questions are not coalesced. The backend must run with
+the client-side rate budgets off (LLM_RPM_LIMIT=0, LLM_TPM_LIMIT=0) and the
+semantic cache unreachable (a threshold above 1), as above; otherwise the
+run measures the scheduler's 30 RPM and cache hits, not the LLM client. Under
+those settings, a blocking LLM call keeps throughput flat at ~1/latency,
+while the async client should grow roughly linearly until LLM_MAX_CONCURRENCY.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+import numpy as np
+
+
+def request_form(form: dict, vary: str, number: int) -> dict:
+    """The form of request `number`, with a distinct `vary` field so no two requests share an answer."""
+    if not vary or vary not in form:
+        return form
+    return {**form, vary: f"{form[vary]} (request {number})"}
+
+
+async def run_level(client: httpx.AsyncClient, url: str, form: dict, level: int, rounds: int,
+                    vary: str = "query", first: int = 0):
+    latencies, failures = [], 0
+    queue = asyncio.Queue()
+    for number in range(first, first + level * rounds):
+        queue.put_nowait(number)
+
+    async def worker():
+        nonlocal failures
+        while not queue.empty():
+            number = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                resp = await client.post(url, data=request_form(form, vary, number))
+                if resp.status_code != 200:
+                    failures += 1
+            except httpx.HTTPError:
+                failures += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(level)))
+    elapsed = time.perf_counter() - start
+
+    ms = np.asarray(latencies) * 1000.0
+    print(
+        f"concurrency {level:>4}: {len(latencies) / elapsed:7.2f} req/s | "
+        f"p50 {np.percentile(ms, 50):7.1f} ms | p95 {np.percentile(ms, 95):7.1f} ms | failures {failures}"
+    )
+
+
+async def main_async(args):
+    form = dict(item.split("=", 1) for item in args.form)
+    limits = httpx.Limits(max_connections=max(args.levels), max_keepalive_connections=max(args.levels))
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        sent = 0
+        for level in args.levels:
+            await run_level(client, args.url, form, level, args.rounds, args.vary, sent)
+            sent += level * args.rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--form", action="append", default=[], help="form field as key=value (repeatable)")
+    parser.add_argument("--levels", nargs="+", type=int, default=[1, 4, 16, 64])
+    parser.add_argument("--rounds", type=int, default=5, help="requests per in-flight slot")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--vary", default="query",
+                        help="form field made unique per request (empty to send identical requests)")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# benchmarks/mock_llm_server.py
+"""
+Local stand-in for the Groq Responses API with a fixed latency.
+
+    python -m backend.benchmarks.mock_llm_server --port 8900 --latency-ms 800 [--rpm-limit 30]
+
+With --rpm-limit it answers 429 with a retry-after header once more than that
+many requests arrived in the last minute, like the real rate limiter.
+
+Point the backend at it with GROQ_ENDPOINT=http://127.0.0.1:8900/openai/v1/responses
+(any GROQ_API_KEY value works).
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI(title="Mock LLM")
+LATENCY_SECONDS = 0.8
+RPM_LIMIT = 0
+_recent = deque()
+
+ANSWER = "This is a mock answer generated for load testing."
+USAGE = {"input_tokens": 900, "output_tokens": 12, "total_tokens": 912}
+
+
+def rate_limited():
+    """Retry-after seconds if this request is over the RPM limit, else None."""
+    if not RPM_LIMIT:
+        return None
+    now = time.monotonic()
+    while _recent and now - _recent[0] > 60:
+        _recent.popleft()
+    if len(_recent) >= RPM_LIMIT:
+        return 60 - (now - _recent[0])
+    _recent.append(now)
+    return None
+
+
+async def stream_answer():
+    # Spread the latency over the tokens, like a real streaming model
+    words = ANSWER.split(" ")
+    for i, word in enumerate(words):
+        await asyncio.sleep(LATENCY_SECONDS / len(words))
+        delta = word if i == 0 else " " + word
+        yield f"event: response.output_text.delta\ndata: {json.dumps({'type': 'response.output_text.delta', 'delta': delta})}\n\n"
+    completed = {"type": "response.completed", "response": {"usage": USAGE}}
+    yield f"event: response.completed\ndata: {json.dumps(completed)}\n\n"
+
+
+@app.post("/openai/v1/responses")
+async def responses(request: Request):
+    body = await request.body()
+    try:
+        stream = bool(json.loads(body).get("stream"))
+    except (ValueError, AttributeError):
+        stream = False
+    retry_after = rate_limited()
+    if retry_after is not None:
+        return JSONResponse(
+            status_code=429,
+            headers={"retry-after": f"{retry_after:.2f}"},
+            content={"error": {"message": "Rate limit reached (mock)", "code": "rate_limit_exceeded"}},
+        )
+    if stream:
+        return StreamingResponse(stream_answer(), media_type="text/event-stream")
+    await asyncio.sleep(LATENCY_SECONDS)
+    return {
+        "output": [
+            {"type": "message", "content": [{"type": "output_text", "text": ANSWER}]}
+        ],
+        "usage": USAGE,
+    }
+
+
+def main():
+    global LATENCY_SECONDS, RPM_LIMIT
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=800)
+    parser.add_argument("--rpm-limit", type=int, default=0)
+    args = parser.parse_args()
+    LATENCY_SECONDS = args.latency_ms / 1000.0
+    RPM_LIMIT = args.rpm_limit
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/vector_store_bench.py
+"""
+Upsert throughput and filtered-search latency for the vector backends.
+
+    python -m backend.benchmarks.vector_store_bench --backends local qdrant --points 50000 --tenants 100
+
+Random unit vectors are spread over `--tenants` user_ids; each query filters on
+one tenant, which is what every production search does. Qdrant and Chroma run
+against a throw-away `bench_vectors` collection that is dropped afterwards.
+"""
+import argparse
+import time
+import uuid
+
+import numpy as np
+
+from backend.database.vector_store import create_vector_store
+
+
+def percentile(values, q):
+    return float(np.percentile(np.asarray(values) * 1000.0, q))
+
+
+def run(backend: str, points: int, tenants: int, dim: int, queries: int, top_k: int, batch: int):
+    if backend == "local":
+        store = create_vector_store("local", path="")  # memory only
+    else:
+        store = create_vector_store(backend, collection_name="bench_vectors")
+    store.ensure_collection(dim)
+
+    rng = np.random.default_rng(42)
+    vectors = rng.standard_normal((points, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    start = time.perf_counter()
+    for i in range(0, points, batch):
+        store.upsert([
+            {
+                "id": str(uuid.uuid4()),
+                "vector": vectors[j],
+                "payload": {"user_id": f"user-{j % tenants}", "doc_id": f"doc-{j % (tenants * 5)}", "text": f"chunk {j}"},
+            }
+            for j in range(i, min(i + batch, points))
+        ])
+    upsert_seconds = time.perf_counter() - start
+
+    latencies = []
+    for q in range(queries):
+        query = vectors[rng.integers(points)]
+        t = time.perf_counter()
+        store.search(query, limit=top_k, filters={"user_id": f"user-{q % tenants}"})
+        latencies.append(time.perf_counter() - t)
+
+    if hasattr(store, "drop_collection"):
+        store.drop_collection()
+
+    print(
+        f"{backend:>7}: upsert {points / upsert_seconds:,.0f} points/sec | "
+        f"search p50 {percentile(latencies, 50):.2f} ms, p95 {percentile(latencies, 95):.2f} ms, "
+        f"p99 {percentile(latencies, 99):.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["local"], choices=["local", "qdrant", "chroma"])
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--tenants", type=int, default=50)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--batch", type=int, default=512)
+    args = parser.parse_args()
+
+    for backend in args.backends:
+        run(backend, args.points, args.tenants, args.dim, args.queries, args.top_k, args.batch)
+
+
+if __name__ == "__main__":
+    main()
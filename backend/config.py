@@ -1,5 +1,139 @@
 # backend/config.py
 import os
+from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv(dotenv_path=Path(__file__).resolve().parent / ".env")
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+
+# --- LLM (Groq Responses API) ---
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_ENDPOINT = os.getenv("GROQ_ENDPOINT", "https://api.groq.com/openai/v1/responses")
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "64"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+# Client-side budgets per worker (0 disables); keep them under the Groq plan limits
+LLM_RPM_LIMIT = int(os.getenv("LLM_RPM_LIMIT", "30"))
+LLM_TPM_LIMIT = int(os.getenv("LLM_TPM_LIMIT", "6000"))
+LLM_QUEUE_MAX = int(os.getenv("LLM_QUEUE_MAX", "100"))
+LLM_QUEUE_MAX_WAIT_SECONDS = float(os.getenv("LLM_QUEUE_MAX_WAIT_SECONDS", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+
+# --- Vector DB ---
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant")  # "qdrant", "chroma" or "local"
+CHROMA_PATH = os.getenv("CHROMA_PATH", "./chroma_data")
+# Empty path keeps the local (NumPy) store in memory only
+LOCAL_VECTOR_PATH = os.getenv("LOCAL_VECTOR_PATH", str(Path(__file__).resolve().parent / ".cache" / "local_vectors"))
+# Writes to the local store are saved at most this often (0 = after every write) and on shutdown
+LOCAL_VECTOR_SAVE_SECONDS = float(os.getenv("LOCAL_VECTOR_SAVE_SECONDS", "5"))
+QDRANT_HOST = os.getenv("QDRANT_HOST", "localhost")
+QDRANT_PORT = int(os.getenv("QDRANT_PORT", "6333"))
+# Multitenant HNSW: no global graph (m=0), per-tenant graphs with payload_m links
+QDRANT_HNSW_M = int(os.getenv("QDRANT_HNSW_M", "0"))
+QDRANT_HNSW_PAYLOAD_M = int(os.getenv("QDRANT_HNSW_PAYLOAD_M", "16"))
+
+# --- Startup ---
+# Load the model and create the collection in the background once the worker is up
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+# --- Ingestion jobs (persistent local queue, bounded worker pool per process) ---
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", str(Path(__file__).resolve().parent / ".cache" / "jobs.sqlite3"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+# A started job with no progress for this long is assumed orphaned (worker died) and requeued
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "900"))
+# Pages extracted ahead of the chunk/embed/store consumer (bounds ingestion memory)
+INGEST_PAGE_BUFFER = int(os.getenv("INGEST_PAGE_BUFFER", "4"))
+
+# --- Text extraction (per-page OCR decisions) ---
+# OCR a PDF page only when its text layer is empty, shorter than this, or garbled
+OCR_MIN_TEXT_CHARS = int(os.getenv("OCR_MIN_TEXT_CHARS", "50"))
+# Share of unexpected characters (CID placeholders, control/private-use glyphs) that marks a layer as garbled
+OCR_GARBLED_RATIO = float(os.getenv("OCR_GARBLED_RATIO", "0.3"))
+# Rasterize so the page's long side has about this many pixels (A4 -> ~300 DPI), within the DPI bounds
+OCR_TARGET_LONG_SIDE_PX = int(os.getenv("OCR_TARGET_LONG_SIDE_PX", "3500"))
+OCR_MIN_DPI = int(os.getenv("OCR_MIN_DPI", "150"))
+OCR_MAX_DPI = int(os.getenv("OCR_MAX_DPI", "400"))
+# OCR runs in a process pool shared by all ingest jobs (0 = inline, in the calling thread)
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 2)))
+# Most pages of one document being OCR'd at once, so one big scan can't take the whole pool
+OCR_DOC_CONCURRENCY = int(os.getenv("OCR_DOC_CONCURRENCY", "4"))
+
+# --- CSV extraction (streamed in row chunks, emitted as row groups with the header) ---
+CSV_READ_ROWS = int(os.getenv("CSV_READ_ROWS", "20000"))
+# Row groups hold at most this many embedding-model tokens, header included (further capped at
+# CHUNK_MAX_TOKENS - CHUNK_MIN_TOKENS so a group is never cut into chunks that lose the header)
+CSV_GROUP_TOKENS = int(os.getenv("CSV_GROUP_TOKENS", "192"))
+
+# --- Chunking (in embedding-model tokens; capped at what the model reads) ---
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "256"))
+# Trailing sentences repeated at the start of the next chunk when a paragraph is cut
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+# A page or paragraph break ends the chunk once it holds this many tokens
+CHUNK_MIN_TOKENS = int(os.getenv("CHUNK_MIN_TOKENS", "64"))
+
+# --- Extraction cache (per-page text keyed by file sha256 + extractor version) ---
+EXTRACT_CACHE_PATH = os.getenv("EXTRACT_CACHE_PATH", str(Path(__file__).resolve().parent / ".cache" / "extracted.sqlite3"))
+EXTRACT_CACHE_MAX_BYTES = int(os.getenv("EXTRACT_CACHE_MAX_BYTES", str(1024 ** 3)))
+
+# --- Embedding engine ---
+EMBED_MODEL_NAME = os.getenv("EMBED_MODEL_NAME", "all-MiniLM-L6-v2")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "2"))
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")  # "torch" or "onnx"
+EMBED_ONNX_FILE = os.getenv("EMBED_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+
+# --- Embedding cache (persistent, shared by workers on the host) ---
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", str(Path(__file__).resolve().parent / ".cache" / "embeddings.sqlite3"))
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "200000"))
+
+# --- Query encoding ---
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "4096"))
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "32"))
+QUERY_BATCH_MAX_WAIT_MS = float(os.getenv("QUERY_BATCH_MAX_WAIT_MS", "5"))
+
+# --- Hybrid retrieval (dense + BM25, fused with reciprocal rank fusion) ---
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", str(Path(__file__).resolve().parent / ".cache" / "lexical.sqlite3"))
+HYBRID_DENSE_K = int(os.getenv("HYBRID_DENSE_K", "10"))
+HYBRID_LEXICAL_K = int(os.getenv("HYBRID_LEXICAL_K", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# --- Cross-encoder rerank (optional stage between retrieval and prompt building) ---
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() in ("1", "true", "yes")
+RERANK_MODEL_NAME = os.getenv("RERANK_MODEL_NAME", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "20000"))
+
+# --- Prompt building (token budget of one LLM request) ---
+# Answers per minute a worker should sustain within LLM_TPM_LIMIT; sizes the default token budget
+LLM_TARGET_RPM = int(os.getenv("LLM_TARGET_RPM", "4"))
+# Prompt + answer: LLM_TPM_LIMIT / LLM_TARGET_RPM, and never above 5400 (under the 6000-token
+# request limit, to absorb tokenizer differences)
+LLM_TOKEN_BUDGET = int(os.getenv(
+    "LLM_TOKEN_BUDGET", str(min(5400, LLM_TPM_LIMIT // max(LLM_TARGET_RPM, 1)) if LLM_TPM_LIMIT > 0 else 5400)))
+LLM_MAX_OUTPUT_TOKENS = int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "512"))
+CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", "cl100k_base")  # tiktoken encoding
+# tiktoken downloads an encoding once; keep it here so restarts (and offline hosts) read it locally
+CONTEXT_TOKENIZER_CACHE = os.getenv("CONTEXT_TOKENIZER_CACHE", str(Path(__file__).resolve().parent / ".cache" / "tiktoken"))
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.85"))
+CONTEXT_MIN_CHUNK_TOKENS = int(os.getenv("CONTEXT_MIN_CHUNK_TOKENS", "64"))
+# Fused hits offered to the packer, which keeps as many as fit; a request's top_k only caps this
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", "20"))
+
+# --- Semantic answer cache (per tenant, in front of the LLM call) ---
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600"))
+SEMANTIC_CACHE_MAX_PER_TENANT = int(os.getenv("SEMANTIC_CACHE_MAX_PER_TENANT", "256"))
+SEMANTIC_CACHE_MAX_TENANTS = int(os.getenv("SEMANTIC_CACHE_MAX_TENANTS", "1000"))
+# Per-tenant generation counters, bumped on re-embedding; shared by the workers of the host
+SEMANTIC_CACHE_GENERATIONS_PATH = os.getenv(
+    "SEMANTIC_CACHE_GENERATIONS_PATH", str(Path(__file__).resolve().parent / ".cache" / "cache_generations.sqlite3"))
+
+# --- API key scopes (key -> owner + document ids, resolved from Mongo at query time) ---
+API_KEY_CACHE_TTL_SECONDS = float(os.getenv("API_KEY_CACHE_TTL_SECONDS", "60"))
+API_KEY_CACHE_SIZE = int(os.getenv("API_KEY_CACHE_SIZE", "10000"))
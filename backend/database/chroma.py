@@ -1,17 +1,33 @@
+import threading
+
 import chromadb
 from chromadb.utils import embedding_functions
 
-client = chromadb.PersistentClient(path="./chroma_data")
+from backend.config import CHROMA_PATH
+from backend.database.vector_store import VectorStore, clean_filters
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Persistent Chroma client, opened on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = chromadb.PersistentClient(path=CHROMA_PATH)
+    return _client
 
-# Use OpenAI embeddings instead of SentenceTransformer
-embedding_function = embedding_functions.OpenAIEmbeddingFunction(
-    api_key="YOUR_OPENAI_API_KEY",  # Replace with your actual key
-    model_name="text-embedding-3-small"
-)
 
 def get_user_collection(user_id: str):
     collection_name = f"user_{user_id}"
-    return client.get_or_create_collection(
+    # Use OpenAI embeddings instead of SentenceTransformer
+    embedding_function = embedding_functions.OpenAIEmbeddingFunction(
+        api_key="YOUR_OPENAI_API_KEY",  # Replace with your actual key
+        model_name="text-embedding-3-small"
+    )
+    return get_client().get_or_create_collection(
         name=collection_name, 
         embedding_function=embedding_function
     )
@@ -33,6 +49,121 @@ def query_document(user_id: str, query_text: str, top_k=3):
         n_results=top_k
     )
 
+
+def build_where(filters: dict):
+    """{field: value|[values]} -> Chroma `where` clause."""
+    clauses = []
+    for field, value in clean_filters(filters).items():
+        clauses.append({field: {"$in": value}} if isinstance(value, list) else {field: value})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+class ChromaVectorStore(VectorStore):
+    """
+    Chroma backend over one shared collection. Vectors are computed by our
+    embedding engine, so the collection has no embedding function; the chunk
+    text is kept as the Chroma document and the rest of the payload as metadata.
+    """
+
+    name = "chroma"
+
+    def __init__(self, collection_name: str = "chatbot_embeddings"):
+        self.collection_name = collection_name
+        self._collection = None
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            self._collection = get_client().get_or_create_collection(
+                name=self.collection_name, metadata={"hnsw:space": "cosine"}
+            )
+        return self._collection
+
+    def ensure_collection(self, dimension: int) -> None:
+        self.collection
+
+    def drop_collection(self) -> None:
+        get_client().delete_collection(name=self.collection_name)
+        self._collection = None
+
+    def is_ready(self) -> bool:
+        try:
+            get_client().heartbeat()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _split(payload: dict):
+        # Chroma metadata only holds scalars; None values are dropped
+        metadata = {k: v for k, v in payload.items() if k != "text" and v is not None}
+        return payload.get("text", ""), metadata
+
+    @staticmethod
+    def _join(document, metadata) -> dict:
+        payload = dict(metadata or {})
+        payload["text"] = document or ""
+        return payload
+
+    def upsert(self, points: list) -> None:
+        if not points:
+            return
+        documents, metadatas = zip(*(self._split(p["payload"]) for p in points))
+        self.collection.upsert(
+            ids=[str(p["id"]) for p in points],
+            embeddings=[p["vector"].tolist() if hasattr(p["vector"], "tolist") else list(p["vector"]) for p in points],
+            documents=list(documents),
+            metadatas=list(metadatas),
+        )
+
+    def get_payloads(self, ids: list) -> dict:
+        if not ids:
+            return {}
+        result = self.collection.get(ids=[str(i) for i in ids], include=["documents", "metadatas"])
+        return {
+            pid: self._join(result["documents"][i], result["metadatas"][i]) for i, pid in enumerate(result["ids"])
+        }
+
+    def search(self, vector, limit: int = 3, filters: dict = None) -> list:
+        result = self.collection.query(
+            query_embeddings=[vector.tolist() if hasattr(vector, "tolist") else list(vector)],
+            n_results=limit,
+            where=build_where(filters),
+            include=["documents", "metadatas", "distances"],
+        )
+        return [
+            # cosine distance -> similarity
+            {"id": pid, "score": 1.0 - distance, "payload": self._join(document, metadata)}
+            for pid, document, metadata, distance in zip(
+                result["ids"][0], result["documents"][0], result["metadatas"][0], result["distances"][0]
+            )
+        ]
+
+    def delete(self, ids: list = None, filters: dict = None) -> None:
+        if ids:
+            self.collection.delete(ids=[str(i) for i in ids])
+        elif clean_filters(filters):
+            self.collection.delete(where=build_where(filters))
+
+    def scroll(self, filters: dict = None, limit: int = 256, offset=None, with_vectors: bool = False):
+        offset = offset or 0
+        include = ["documents", "metadatas"] + (["embeddings"] if with_vectors else [])
+        result = self.collection.get(where=build_where(filters), limit=limit, offset=offset, include=include)
+        records = []
+        for i, pid in enumerate(result["ids"]):
+            record = {"id": pid, "score": None, "payload": self._join(result["documents"][i], result["metadatas"][i])}
+            if with_vectors:
+                record["vector"] = result["embeddings"][i]
+            records.append(record)
+        return records, (offset + limit if len(records) == limit else None)
+
+    def count(self, filters: dict = None) -> int:
+        if not clean_filters(filters):
+            return self.collection.count()
+        return len(self.collection.get(where=build_where(filters), include=[])["ids"])
+
 # import chromadb
 # from chromadb.utils import embedding_functions
 
@@ -0,0 +1,281 @@
+# database/local_store.py
+import atexit
+import json
+import os
+import threading
+
+import numpy as np
+
+from backend.config import LOCAL_VECTOR_PATH, LOCAL_VECTOR_SAVE_SECONDS
+from backend.database.vector_store import VectorStore, clean_filters
+
+# Payload fields that get a bitmap per distinct value (tenant / document filters)
+INDEXED_FIELDS = ("user_id", "api_key", "doc_id")
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process backend for small deployments, tests and benchmarks.
+
+    Vectors live in one contiguous float32 matrix (rows L2-normalised, so a
+    matrix-vector product is cosine similarity). Every value of an indexed
+    payload field owns a boolean bitmap over the rows, so tenant filters are a
+    few vectorised ANDs/ORs instead of a payload scan. Deleted rows are
+    recycled. When `path` is set the store is loaded from / saved to disk;
+    writes are batched into one save at most every `save_seconds` (a
+    snapshot is taken under the lock, the files are written outside it), and
+    flush() saves what is pending, e.g. at shutdown.
+    """
+
+    name = "local"
+
+    def __init__(self, path: str = LOCAL_VECTOR_PATH, initial_capacity: int = 1024,
+                 save_seconds: float = LOCAL_VECTOR_SAVE_SECONDS):
+        self.path = path or None
+        self.save_seconds = save_seconds
+        self._lock = threading.RLock()
+        self._save_lock = threading.Lock()  # one writer of the files at a time
+        self._dirty = False
+        self._timer = None
+        self._generation = 0        # snapshots taken / written, so an older one never replaces a newer
+        self._saved_generation = 0
+        self._dim = None
+        self._capacity = initial_capacity
+        self._vectors = None
+        self._alive = np.zeros(initial_capacity, dtype=bool)
+        self._size = 0             # high-water mark of used rows
+        self._ids = []             # row -> point id
+        self._payloads = []        # row -> payload
+        self._rows = {}            # point id -> row
+        self._free = []            # recycled rows
+        self._bitmaps = {field: {} for field in INDEXED_FIELDS}
+        if self.path:
+            self._load()
+            atexit.register(self.flush)
+
+    # --- Storage ---
+
+    def _allocate(self, dimension: int) -> None:
+        self._dim = dimension
+        self._vectors = np.zeros((self._capacity, dimension), dtype=np.float32)
+
+    def _grow(self) -> None:
+        new_capacity = self._capacity * 2
+        vectors = np.zeros((new_capacity, self._dim), dtype=np.float32)
+        vectors[:self._capacity] = self._vectors
+        self._vectors = vectors
+        self._alive = np.concatenate([self._alive, np.zeros(self._capacity, dtype=bool)])
+        for values in self._bitmaps.values():
+            for value, bitmap in values.items():
+                values[value] = np.concatenate([bitmap, np.zeros(self._capacity, dtype=bool)])
+        self._capacity = new_capacity
+
+    def _bitmap(self, field: str, value) -> np.ndarray:
+        values = self._bitmaps[field]
+        if value not in values:
+            values[value] = np.zeros(self._capacity, dtype=bool)
+        return values[value]
+
+    def _index(self, row: int, payload: dict, flag: bool) -> None:
+        for field in INDEXED_FIELDS:
+            value = payload.get(field)
+            if value is not None:
+                self._bitmap(field, value)[row] = flag
+
+    def _take_row(self) -> int:
+        if self._free:
+            return self._free.pop()
+        if self._size == self._capacity:
+            self._grow()
+        row = self._size
+        self._size += 1
+        self._ids.append(None)
+        self._payloads.append(None)
+        return row
+
+    def _release(self, row: int) -> None:
+        self._index(row, self._payloads[row], False)
+        self._alive[row] = False
+        del self._rows[self._ids[row]]
+        self._ids[row] = None
+        self._payloads[row] = None
+        self._free.append(row)
+
+    # --- Filtering ---
+
+    def _mask(self, filters: dict) -> np.ndarray:
+        mask = self._alive[:self._size].copy()
+        for field, value in clean_filters(filters).items():
+            values = value if isinstance(value, list) else [value]
+            if field in self._bitmaps:
+                selected = np.zeros(self._size, dtype=bool)
+                for v in values:
+                    bitmap = self._bitmaps[field].get(v)
+                    if bitmap is not None:
+                        selected |= bitmap[:self._size]
+            else:
+                wanted = set(values)
+                selected = np.fromiter(
+                    (p is not None and p.get(field) in wanted for p in self._payloads),
+                    dtype=bool,
+                    count=self._size,
+                )
+            mask &= selected
+        return mask
+
+    # --- VectorStore interface ---
+
+    def ensure_collection(self, dimension: int) -> None:
+        with self._lock:
+            if self._vectors is None:
+                self._allocate(dimension)
+            elif self._dim != dimension:
+                raise ValueError(f"Local store has dimension {self._dim}, model produces {dimension}")
+
+    def is_ready(self) -> bool:
+        return True
+
+    def upsert(self, points: list) -> None:
+        if not points:
+            return
+        with self._lock:
+            if self._vectors is None:
+                self._allocate(len(points[0]["vector"]))
+            for p in points:
+                pid = str(p["id"])
+                vector = np.asarray(p["vector"], dtype=np.float32)
+                norm = np.linalg.norm(vector)
+                row = self._rows.get(pid)
+                if row is None:
+                    row = self._take_row()
+                    self._rows[pid] = row
+                    self._ids[row] = pid
+                else:
+                    self._index(row, self._payloads[row], False)
+                self._vectors[row] = vector / norm if norm else vector
+                self._payloads[row] = dict(p["payload"])
+                self._alive[row] = True
+                self._index(row, self._payloads[row], True)
+            self._changed()
+
+    def get_payloads(self, ids: list) -> dict:
+        with self._lock:
+            return {str(i): dict(self._payloads[self._rows[str(i)]]) for i in ids if str(i) in self._rows}
+
+    def search(self, vector, limit: int = 3, filters: dict = None) -> list:
+        with self._lock:
+            if self._vectors is None or self._size == 0:
+                return []
+            query = np.asarray(vector, dtype=np.float32)
+            norm = np.linalg.norm(query)
+            if norm:
+                query = query / norm
+            rows = np.flatnonzero(self._mask(filters))
+            if rows.size == 0:
+                return []
+            scores = self._vectors[rows] @ query
+            k = min(limit, rows.size)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                {"id": self._ids[rows[i]], "score": float(scores[i]), "payload": dict(self._payloads[rows[i]])}
+                for i in top
+            ]
+
+    def delete(self, ids: list = None, filters: dict = None) -> None:
+        with self._lock:
+            if ids:
+                rows = [self._rows[str(i)] for i in ids if str(i) in self._rows]
+            elif clean_filters(filters) and self._size:
+                rows = np.flatnonzero(self._mask(filters)).tolist()
+            else:
+                return
+            for row in rows:
+                self._release(row)
+            self._changed()
+
+    def scroll(self, filters: dict = None, limit: int = 256, offset=None, with_vectors: bool = False):
+        with self._lock:
+            if self._size == 0:
+                return [], None
+            rows = np.flatnonzero(self._mask(filters))
+            start = offset or 0
+            page = rows[start:start + limit]
+            records = []
+            for row in page:
+                record = {"id": self._ids[row], "score": None, "payload": dict(self._payloads[row])}
+                if with_vectors:
+                    record["vector"] = self._vectors[row].tolist()
+                records.append(record)
+            next_offset = start + limit if start + limit < rows.size else None
+            return records, next_offset
+
+    def count(self, filters: dict = None) -> int:
+        with self._lock:
+            return int(self._mask(filters).sum()) if self._size else 0
+
+    # --- Persistence ---
+
+    def _changed(self) -> None:
+        """Called under the lock after a write: schedule one save for everything written meanwhile."""
+        if not self.path:
+            return
+        self._dirty = True
+        if self.save_seconds <= 0:
+            self.flush()
+        elif self._timer is None:
+            self._timer = threading.Timer(self.save_seconds, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._timer = None
+            if not self._dirty or not self.path or self._vectors is None:
+                return
+            # Payload dicts are replaced, never mutated, so shallow copies are a consistent snapshot
+            live = np.flatnonzero(self._alive[:self._size])
+            snapshot = (self._vectors[live], [self._ids[r] for r in live], [self._payloads[r] for r in live])
+            self._dirty = False
+            self._generation += 1
+            generation = self._generation
+        try:
+            # Never takes self._lock while holding _save_lock, so a write that saves inline can't deadlock
+            with self._save_lock:
+                if generation > self._saved_generation:
+                    self._save(*snapshot)
+                    self._saved_generation = generation
+        except Exception:
+            with self._lock:
+                self._dirty = True
+            raise
+
+    def _save(self, vectors: np.ndarray, ids: list, payloads: list) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        tmp_vectors = os.path.join(self.path, "vectors.tmp.npy")
+        tmp_meta = os.path.join(self.path, "points.tmp.json")
+        np.save(tmp_vectors, vectors)
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump({"ids": ids, "payloads": payloads}, f)
+        os.replace(tmp_vectors, os.path.join(self.path, "vectors.npy"))
+        os.replace(tmp_meta, os.path.join(self.path, "points.json"))
+
+    def _load(self) -> None:
+        vectors_path = os.path.join(self.path, "vectors.npy")
+        meta_path = os.path.join(self.path, "points.json")
+        if not (os.path.exists(vectors_path) and os.path.exists(meta_path)):
+            return
+        vectors = np.load(vectors_path)
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        while self._capacity < len(vectors):
+            self._capacity *= 2
+        self._alive = np.zeros(self._capacity, dtype=bool)
+        self._allocate(vectors.shape[1])
+        path, self.path = self.path, None  # no re-save while loading
+        self.upsert([
+            {"id": pid, "vector": vectors[i], "payload": payload}
+            for i, (pid, payload) in enumerate(zip(meta["ids"], meta["payloads"]))
+        ])
+        self.path = path
+        print(f"[local-store] loaded {len(vectors)} points from {self.path}")
@@ -25,6 +25,10 @@ fs = gridfs.GridFS(db)
 def get_api_keys_by_user(user_id: str):
     return list(api_keys_collection.find({"user_id": ObjectId(user_id)}))
 
+def get_api_key(key: str):
+    """The stored API key document (owner and selected documents), or None."""
+    return api_keys_collection.find_one({"key": key}, {"user_id": 1, "documents": 1})
+
 def get_user_by_email(email: str):
     """Find a user by email."""
     return users_collection.find_one({"email": email})
@@ -53,6 +57,19 @@ def save_document_metadata(user_id: str, filename: str, file_id: str, content_ty
     return documents_collection.insert_one(doc)
 
 
+def set_document_status(user_id: str, filename: str, status: str, **fields):
+    """
+    Set the ingestion `status` (queued, extracting, embedding, ready, error) of
+    a user's uploaded document, plus any extra fields (job id, chunk count, error).
+    """
+    if not ObjectId.is_valid(user_id):
+        return None
+    return documents_collection.update_many(
+        {"userId": ObjectId(user_id), "filename": filename},
+        {"$set": {"status": status, "statusUpdatedAt": datetime.utcnow(), **fields}},
+    )
+
+
 def get_user_documents(user_id: str):
     """Fetch all documents uploaded by a user."""
     docs = list(documents_collection.find({"user_id": ObjectId(user_id)}))
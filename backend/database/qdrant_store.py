@@ -0,0 +1,153 @@
+# database/qdrant_store.py
+import threading
+
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+from qdrant_client.models import PointStruct, Filter, FieldCondition, MatchValue, MatchAny
+
+from backend.config import QDRANT_HOST, QDRANT_PORT, QDRANT_HNSW_M, QDRANT_HNSW_PAYLOAD_M
+from backend.database.vector_store import VectorStore, clean_filters
+
+COLLECTION_NAME = "chatbot_embeddings"
+
+# Tenant field gets a per-tenant HNSW subgraph; the others are plain keyword filters
+PAYLOAD_INDEXES = {
+    "user_id": models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD, is_tenant=True),
+    "api_key": models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD),
+    "doc_id": models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD),
+}
+
+
+def _hnsw_config():
+    # m=0 skips the global graph; payload_m builds one graph per indexed tenant value
+    return models.HnswConfigDiff(m=QDRANT_HNSW_M, payload_m=QDRANT_HNSW_PAYLOAD_M)
+
+
+def build_filter(filters: dict):
+    """{field: value|[values]} -> Qdrant Filter (must over all fields, MatchAny for lists)."""
+    conditions = []
+    for field, value in clean_filters(filters).items():
+        if isinstance(value, list):
+            conditions.append(FieldCondition(key=field, match=MatchAny(any=value)))
+        else:
+            conditions.append(FieldCondition(key=field, match=MatchValue(value=value)))
+    return Filter(must=conditions) if conditions else None
+
+
+class QdrantVectorStore(VectorStore):
+    """Qdrant backend; the client is created on first use instead of at import."""
+
+    name = "qdrant"
+
+    def __init__(self, collection_name: str = COLLECTION_NAME, host: str = QDRANT_HOST, port: int = QDRANT_PORT):
+        self.collection_name = collection_name
+        self.host = host
+        self.port = port
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> QdrantClient:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = QdrantClient(self.host, port=self.port)
+        return self._client
+
+    def is_ready(self) -> bool:
+        try:
+            self.client.get_collections()
+            return True
+        except Exception:
+            return False
+
+    def ensure_collection(self, dimension: int) -> None:
+        """Create the collection (if missing) and bring payload indexes / HNSW settings up to date."""
+        qdrant = self.client
+        collection_names = [c.name for c in qdrant.get_collections().collections]
+
+        if self.collection_name not in collection_names:
+            qdrant.create_collection(
+                collection_name=self.collection_name,
+                vectors_config=models.VectorParams(size=dimension, distance=models.Distance.COSINE),
+                hnsw_config=_hnsw_config(),
+            )
+            print(f"Created new collection: {self.collection_name}")
+        else:
+            print("Collection already exists — reusing existing data.")
+            hnsw = qdrant.get_collection(self.collection_name).config.hnsw_config
+            if hnsw.m != QDRANT_HNSW_M or hnsw.payload_m != QDRANT_HNSW_PAYLOAD_M:
+                qdrant.update_collection(collection_name=self.collection_name, hnsw_config=_hnsw_config())
+                print(f"Updated HNSW config: m={QDRANT_HNSW_M}, payload_m={QDRANT_HNSW_PAYLOAD_M}")
+
+        existing = qdrant.get_collection(self.collection_name).payload_schema or {}
+        for field, schema in PAYLOAD_INDEXES.items():
+            if field not in existing:
+                qdrant.create_payload_index(
+                    collection_name=self.collection_name, field_name=field, field_schema=schema, wait=True
+                )
+                print(f"Created payload index: {field}")
+
+    def drop_collection(self) -> None:
+        self.client.delete_collection(collection_name=self.collection_name)
+
+    def upsert(self, points: list) -> None:
+        if not points:
+            return
+        structs = [
+            PointStruct(
+                id=p["id"],
+                vector=p["vector"].tolist() if hasattr(p["vector"], "tolist") else list(p["vector"]),
+                payload=p["payload"],
+            )
+            for p in points
+        ]
+        self.client.upsert(collection_name=self.collection_name, points=structs)
+
+    def get_payloads(self, ids: list) -> dict:
+        if not ids:
+            return {}
+        records = self.client.retrieve(
+            collection_name=self.collection_name, ids=list(ids), with_payload=True, with_vectors=False
+        )
+        return {str(r.id): r.payload for r in records}
+
+    def search(self, vector, limit: int = 3, filters: dict = None) -> list:
+        results = self.client.search(
+            collection_name=self.collection_name,
+            query_vector=vector.tolist() if hasattr(vector, "tolist") else list(vector),
+            query_filter=build_filter(filters),
+            limit=limit,
+        )
+        return [{"id": str(r.id), "score": r.score, "payload": r.payload} for r in results]
+
+    def delete(self, ids: list = None, filters: dict = None) -> None:
+        if ids:
+            selector = models.PointIdsList(points=list(ids))
+        elif clean_filters(filters):
+            selector = models.FilterSelector(filter=build_filter(filters))
+        else:
+            return
+        self.client.delete(collection_name=self.collection_name, points_selector=selector)
+
+    def scroll(self, filters: dict = None, limit: int = 256, offset=None, with_vectors: bool = False):
+        records, next_offset = self.client.scroll(
+            collection_name=self.collection_name,
+            scroll_filter=build_filter(filters),
+            limit=limit,
+            offset=offset,
+            with_payload=True,
+            with_vectors=with_vectors,
+        )
+        out = []
+        for r in records:
+            record = {"id": str(r.id), "score": None, "payload": r.payload}
+            if with_vectors:
+                record["vector"] = r.vector
+            out.append(record)
+        return out, next_offset
+
+    def count(self, filters: dict = None) -> int:
+        return self.client.count(
+            collection_name=self.collection_name, count_filter=build_filter(filters), exact=True
+        ).count
@@ -0,0 +1,94 @@
+# database/vector_store.py
+import threading
+
+from backend.config import VECTOR_BACKEND
+
+# Points are plain dicts: {"id": str, "vector": list|ndarray, "payload": dict}
+# Search hits / scroll records: {"id": str, "score": float, "payload": dict} (+ "vector" when asked)
+# Filters: {field: value} or {field: [v1, v2]} (any-of); all fields must match, None values are ignored
+
+
+class VectorStore:
+    """Interface every vector backend implements (Qdrant, Chroma, in-process NumPy)."""
+
+    name = "base"
+
+    def ensure_collection(self, dimension: int) -> None:
+        """Create the collection/indexes if missing; safe to call repeatedly."""
+        raise NotImplementedError
+
+    def is_ready(self) -> bool:
+        """True when the backend can serve requests."""
+        raise NotImplementedError
+
+    def upsert(self, points: list) -> None:
+        """Insert or overwrite points by id."""
+        raise NotImplementedError
+
+    def get_payloads(self, ids: list) -> dict:
+        """{id: payload} of the `ids` already stored."""
+        raise NotImplementedError
+
+    def search(self, vector, limit: int = 3, filters: dict = None) -> list:
+        """Top-`limit` hits by cosine similarity, best first."""
+        raise NotImplementedError
+
+    def delete(self, ids: list = None, filters: dict = None) -> None:
+        """Delete points by id or by filter."""
+        raise NotImplementedError
+
+    def scroll(self, filters: dict = None, limit: int = 256, offset=None, with_vectors: bool = False):
+        """Page through matching points; returns (records, next_offset) with next_offset None at the end."""
+        raise NotImplementedError
+
+    def count(self, filters: dict = None) -> int:
+        """Number of points matching the filter."""
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Persist writes the backend buffers; a no-op for backends that write through."""
+
+
+def clean_filters(filters: dict) -> dict:
+    """Drop None values and normalise single values / tuples so backends see {field: value|list}."""
+    cleaned = {}
+    for field, value in (filters or {}).items():
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            value = list(value)
+        cleaned[field] = value
+    return cleaned
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_vector_store() -> VectorStore:
+    """Shared store for the configured VECTOR_BACKEND, created on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_vector_store(VECTOR_BACKEND)
+    return _store
+
+
+def flush_vector_store() -> None:
+    """Flush the shared store if it was created (at shutdown)."""
+    if _store is not None:
+        _store.flush()
+
+
+def create_vector_store(backend: str, **kwargs) -> VectorStore:
+    if backend == "qdrant":
+        from backend.database.qdrant_store import QdrantVectorStore
+        return QdrantVectorStore(**kwargs)
+    if backend == "chroma":
+        from backend.database.chroma import ChromaVectorStore
+        return ChromaVectorStore(**kwargs)
+    if backend == "local":
+        from backend.database.local_store import LocalVectorStore
+        return LocalVectorStore(**kwargs)
+    raise ValueError(f"Unsupported vector backend: {backend}")
@@ -1,18 +1,40 @@
 # main.py
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 import os
+import json
+import hashlib
 import shutil
-import requests
+import threading
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException,APIRouter, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 from pathlib import Path
 # --- Local imports for utils ---
-from .utils.extract_text import extract_text
-from .utils.embed_store import init_collection, store_embeddings, query_embeddings
+from .utils.embed_store import init_collection, retrieve, vector_store_ready, user_doc_ids, flush_vector_store
+from .utils.job_queue import job_queue
+from .utils.ingest import run_ingest_job, enqueue_ingest
+from .utils.api_key_scope import api_key_scopes
+from .utils.extract_text import ocr_stats, shutdown_ocr_pool
+from .utils.extraction_cache import extraction_cache
+from .utils.embedding_engine import engine
+from .utils.embedding_cache import embedding_cache
+from .utils import query_encoder
+from .utils.query_encoder import encode_query
+from .utils.reranker import reranker
+from .utils.llm_client import llm_client, LLMError
+from .utils.semantic_cache import semantic_cache, user_tenant, api_key_tenant
+from .utils.single_flight import single_flight, normalize_query
+from .utils.context_packer import pack_context, load_encoding
 
 
 # --- Router imports ---
 from backend.routes import documents, chat, users, apikeys
+from backend.config import (WARMUP_ON_STARTUP, RERANK_ENABLED, RERANK_CANDIDATES, GROQ_API_KEY, LLM_MAX_OUTPUT_TOKENS,
+                            CONTEXT_CANDIDATES)
 
 env_path = Path(__file__).resolve().parent / ".env"
 load_dotenv(dotenv_path=env_path)
@@ -20,8 +42,6 @@ load_dotenv(dotenv_path=env_path)
 # --- CONFIG ---
 UPLOAD_DIR = "../../backend/public/uploaded_files"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-GROQ_ENDPOINT = "https://api.groq.com/openai/v1/responses"
 
 # --- FastAPI instance ---
 app = FastAPI(title="RAG Document Service")
@@ -50,13 +70,56 @@ app.include_router(apikeys.router, prefix="/apikeys", tags=["API Keys"])
 
 # --- Global variable to track collection initialization ---
 COLLECTION_INIT = False
+_collection_lock = threading.Lock()
 
 # --- Helper: Initialize Qdrant Collection ---
 def ensure_collection():
     global COLLECTION_INIT
     if not COLLECTION_INIT:
-        init_collection()
-        COLLECTION_INIT = True
+        with _collection_lock:
+            if not COLLECTION_INIT:
+                init_collection()
+                COLLECTION_INIT = True
+
+# --- Startup: measure cold start, optionally warm up in the background ---
+STARTUP = {"import_seconds": None, "warmup_seconds": None, "warmup_error": None}
+
+def warm_up():
+    start = time.perf_counter()
+    try:
+        engine.warm_up()
+        if RERANK_ENABLED:
+            reranker.warm_up()
+        ensure_collection()
+    except Exception as e:
+        STARTUP["warmup_error"] = str(e)
+        print(f"[WARN] Warm-up failed: {e}")
+    STARTUP["warmup_seconds"] = round(time.perf_counter() - start, 3)
+    print(f"[startup] warm-up finished in {STARTUP['warmup_seconds']}s")
+
+@app.on_event("startup")
+async def on_startup():
+    STARTUP["import_seconds"] = round(time.perf_counter() - _IMPORT_STARTED, 3)
+    print(f"[startup] worker accepting requests {STARTUP['import_seconds']}s after import")
+    # Token counting runs inside request handlers; don't let the first one read the encoding
+    await run_in_threadpool(load_encoding)
+    if WARMUP_ON_STARTUP:
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    job_queue.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    job_queue.stop()
+    shutdown_ocr_pool()
+    flush_vector_store()
+    await llm_client.aclose()
+
+# --- Background ingestion (extract -> chunk -> embed -> store) ---
+def ingest_job(params: dict, report):
+    ensure_collection()
+    return run_ingest_job(params, report)
+
+job_queue.register("ingest", ingest_job)
 
 # --- Helper: Validate required fields ---
 def validate_fields(fields: dict):
@@ -64,65 +127,159 @@ def validate_fields(fields: dict):
     if missing:
         raise HTTPException(status_code=400, detail=f"Missing required fields: {', '.join(missing)}")
 
+def save_upload(file: UploadFile, file_path: str):
+    # Write next to the target and swap, so a job still reading the old version never sees a partial file
+    partial = f"{file_path}.part"
+    try:
+        with open(partial, "wb") as f:
+            shutil.copyfileobj(file.file, f)
+        os.replace(partial, file_path)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to save file: {e}")
+
 # --- Endpoints: Upload & Embed / Query / Embed Existing ---
 @app.post("/upload_and_embed")
 async def upload_and_embed(
     user_id: str = Form(...),
-    api_key: str = Form(...),
+    api_key: str = Form(None),  # unused: vectors are stored per user, API keys select documents
     # doc_id: str = Form(...),
     file: UploadFile = File(...)
 ):
-    validate_fields({"user_id": user_id, "api_key": api_key, "file": file.filename})
-    ensure_collection()
+    validate_fields({"user_id": user_id, "file": file.filename})
 
     file_path = os.path.join(UPLOAD_DIR, f"{user_id}_{file.filename}")
-    try:
-        with open(file_path, "wb") as f:
-            shutil.copyfileobj(file.file, f)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to save file: {e}")
-
-    try:
-        text = extract_text(file_path)
-        if not text.strip():
-            raise HTTPException(status_code=400, detail="No text could be extracted from the document.")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Text extraction failed: {e}")
-
-    chunk_size = 2000
-    chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+    await run_in_threadpool(save_upload, file, file_path)
 
-    try:
-        store_embeddings(user_id, api_key, chunks)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Embedding/storage failed: {e}")
-
-    return {
-        "message": "Document processed successfully",
+    # OCR, chunking and embedding run in the background job queue; poll /jobs/{job_id}
+    job_id = await run_in_threadpool(enqueue_ingest, user_id, file_path, file.filename)
+    return JSONResponse(status_code=202, content={
+        "message": "Document queued for processing",
         "user_id": user_id,
-        "num_chunks": len(chunks),
+        "job_id": job_id,
+        "status": "queued",
         "file_path": file_path
-    }
+    })
+
+# --- Helper: Validate per-request retrieval options ---
+def validate_retrieval_options(top_k: int, dense_weight: float, lexical_weight: float):
+    if top_k is not None and not 1 <= top_k <= CONTEXT_CANDIDATES:
+        raise HTTPException(status_code=400, detail=f"top_k must be between 1 and {CONTEXT_CANDIDATES}")
+    if dense_weight < 0 or lexical_weight < 0 or dense_weight + lexical_weight == 0:
+        raise HTTPException(status_code=400, detail="Weights must be non-negative and not both zero")
+
+def parse_doc_ids(doc_ids: str):
+    """Comma-separated document ids (or file names) of a query form; None searches all documents."""
+    names = [d.strip() for d in (doc_ids or "").split(",") if d.strip()]
+    return names or None
+
+# --- Helper: Hybrid retrieval + optional cross-encoder rerank ---
+async def retrieve_context(query: str, top_k: int, dense_weight: float, lexical_weight: float,
+                           rerank: bool, user_id: str = None, api_key: str = None, doc_ids: tuple = None):
+    """
+    Ranked hits for the context packer: CONTEXT_CANDIDATES of them, so the packer
+    can fill the token budget, or at most `top_k` when the request sets it.
+    """
+    validate_retrieval_options(top_k, dense_weight, lexical_weight)
+    query_vector = await encode_query(query) if dense_weight > 0 else None
+    limit = top_k or CONTEXT_CANDIDATES
+    # Rerank needs a wider candidate pool to choose the best hits from
+    candidates = max(limit, RERANK_CANDIDATES) if rerank else limit
+    # Vector search and BM25 are blocking calls; keep them off the event loop
+    hits = await run_in_threadpool(
+        retrieve, user_id=user_id, api_key=api_key, doc_ids=doc_ids, query_text=query, query_vector=query_vector,
+        top_k=candidates, dense_weight=dense_weight, lexical_weight=lexical_weight)
+    if rerank:
+        hits = await reranker.rerank(query, hits, limit)
+    return hits
+
+# --- Helpers: Server-Sent Events streaming of the LLM answer ---
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def hit_sources(hits: list) -> list:
+    return [{"id": h["id"], "doc_id": h["payload"].get("doc_id"), "score": h["score"]} for h in hits]
+
+def sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def stream_llm_response(prompt: str, hits: list, started: float, timings: dict, on_complete=None) -> StreamingResponse:
+    """
+    Forward LLM tokens as `token` events while they arrive, then a final `done`
+    event with sources and timings (an `error` event replaces it on failure).
+    `on_complete` receives the full answer only when the provider completed the
+    response; a failed, cut or malformed stream is never handed to it (or cached).
+    """
+    async def events():
+        llm_started = time.perf_counter()
+        parts = []
+        try:
+            async for delta in llm_client.stream(prompt, max_output_tokens=LLM_MAX_OUTPUT_TOKENS):
+                if "first_token_ms" not in timings:
+                    timings["first_token_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                parts.append(delta)
+                yield sse_event("token", {"text": delta})
+        except LLMError as e:
+            yield sse_event("error", {"status": e.status_code, "detail": e.text})
+            return
+        except Exception as e:
+            print(f"[WARN] LLM stream failed: {e!r}")
+            yield sse_event("error", {"status": 502, "detail": "LLM stream failed"})
+            return
+        timings["llm_ms"] = round((time.perf_counter() - llm_started) * 1000, 1)
+        timings["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        if on_complete is not None:
+            on_complete("".join(parts).strip())
+        yield sse_event("done", {"sources": hit_sources(hits), "timings": timings})
+
+    return sse_response(events())
+
+# --- Helpers: per-tenant semantic answer cache ---
+def cache_scope(top_k: int, dense_weight: float, lexical_weight: float, rerank: bool, doc_ids: tuple = None) -> str:
+    """Answers are only reused for the same retrieval options and documents."""
+    scope = f"k={top_k}|d={dense_weight}|l={lexical_weight}|r={int(rerank)}"
+    if doc_ids is not None:
+        scope += "|docs=" + hashlib.sha1("\x1f".join(sorted(doc_ids)).encode("utf-8")).hexdigest()
+    return scope
+
+def cached_answer_response(cached: dict, stream: bool, started: float):
+    if not stream:
+        return {"llm_response": cached["llm_response"]}
+    timings = {"cache": "hit", "total_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    async def events():
+        yield sse_event("token", {"text": cached["llm_response"]})
+        yield sse_event("done", {"sources": cached["sources"], "timings": timings})
+
+    return sse_response(events())
+
+def answer_cache_writer(tenant: str, query_vector, scope: str, hits: list, generation: int = None):
+    def remember(answer: str):
+        if answer:
+            semantic_cache.store(tenant, query_vector, {"llm_response": answer, "sources": hit_sources(hits)},
+                                 scope, generation=generation)
+    return remember
+
+# --- Prompts ---
+def user_prompt(context_text: str, query: str) -> str:
+    return f"""
+You are a helpful assistant. Use the context below to answer the question.
+Provide only **one to four concise sentence** as the answer. Do NOT include reasoning, steps, or extra text.
 
-@app.post("/query_llm")
-async def query_llm(
-    user_id: str = Form(...),
-    query: str = Form(...)
-):
-    print(GROQ_API_KEY)
-    if not GROQ_API_KEY:
-        raise HTTPException(status_code=500, detail="Set GROQ_API_KEY in environment.")
-    print(user_id+" "+query,end="\n")
-    ensure_collection()
-    # doc_list = [d.strip() for d in doc_ids.split(",") if d.strip()]
-    chunks = query_embeddings(user_id=user_id, query_text=query)
-    if not chunks:
-        raise HTTPException(status_code=404, detail="No relevant context found in vector DB.")
+Context:
+{context_text}
 
-    context_text = "\n\n".join(chunks)
-    prompt = f"""
+Question: {query}
+Answer:
+"""
+
+def api_prompt(context_text: str, query: str) -> str:
+    return f"""
 You are a helpful assistant. Use the context below to answer the question.
-Provide only **one to four concise sentence** as the answer. Do NOT include reasoning, steps, or extra text.
+Provide only one to four concise sentences as the answer. Do NOT include reasoning, steps, or extra text.
 
 Context:
 {context_text}
@@ -131,19 +288,105 @@ Question: {query}
 Answer:
 """
 
-    headers = {"Authorization": f"Bearer {GROQ_API_KEY}"}
-    payload = {
-        "model": "llama-3.1-8b-instant",
-        "input": prompt,
-        "temperature": 0.2,
-        "max_output_tokens": 512
+# --- Helpers: query pipeline shared by concurrent identical requests ---
+async def prepare_answer(tenant: str, scope: str, query: str, top_k: int, dense_weight: float,
+                         lexical_weight: float, rerank: bool, user_id: str = None, api_key: str = None,
+                         doc_ids: tuple = None) -> dict:
+    """Cached answer for the query, or the retrieved hits to build a prompt from."""
+    started = time.perf_counter()
+    query_vector = await encode_query(query)
+    # Read before retrieval: an answer built from documents re-embedded meanwhile is not cached
+    generation = semantic_cache.generation(tenant)
+    cached = semantic_cache.lookup(tenant, query_vector, scope, generation)
+    if cached is not None:
+        return {"cached": cached}
+
+    hits = await retrieve_context(query, top_k, dense_weight, lexical_weight, rerank,
+                                  user_id=user_id, api_key=api_key, doc_ids=doc_ids)
+    if not hits:
+        raise HTTPException(status_code=404, detail="No relevant context found in vector DB.")
+    return {
+        "hits": hits,
+        "query_vector": query_vector,
+        "generation": generation,
+        "retrieval_ms": round((time.perf_counter() - started) * 1000, 1),
     }
 
-    resp = requests.post(GROQ_ENDPOINT, headers=headers, json=payload)
-    # if resp.status_code != 200:
-    #     raise HTTPException(status_code=500, detail=f"Groq API call failed: {resp.status_code} {resp.text}")
-    if resp.status_code != 200:
-        error_text = resp.text
+def build_context(hits: list, query: str, build_prompt):
+    """Pack the ranked hits into the prompt's token budget; only the packed hits are sources."""
+    context_text, packed, _ = pack_context(hits, query, build_prompt)
+    if not packed:
+        raise HTTPException(status_code=413, detail="Question too long for the model's token budget.")
+    return context_text, packed
+
+async def answer_query(build_prompt, tenant: str, scope: str, query: str, top_k: int, dense_weight: float,
+                       lexical_weight: float, rerank: bool, user_id: str = None, api_key: str = None,
+                       doc_ids: tuple = None) -> dict:
+    """Full non-streaming pipeline: cache, retrieval, LLM. Raises LLMError for the caller to map."""
+    prepared = await prepare_answer(tenant, scope, query, top_k, dense_weight, lexical_weight, rerank,
+                                    user_id=user_id, api_key=api_key, doc_ids=doc_ids)
+    if "cached" in prepared:
+        return prepared["cached"]
+    context_text, hits = build_context(prepared["hits"], query, build_prompt)
+    prompt = build_prompt(context_text, query)
+    llm_response = await llm_client.generate(prompt, max_output_tokens=LLM_MAX_OUTPUT_TOKENS)
+    answer_cache_writer(tenant, prepared["query_vector"], scope, hits, prepared["generation"])(llm_response)
+    return {"llm_response": llm_response, "sources": hit_sources(hits)}
+
+async def answer_or_stream(build_prompt, tenant: str, query: str, top_k: int, dense_weight: float,
+                           lexical_weight: float, rerank: bool, stream: bool,
+                           user_id: str = None, api_key: str = None, doc_ids: tuple = None):
+    """
+    Run the query pipeline once per identical in-flight (tenant, query, options):
+    JSON requests share the whole run including the LLM call, streaming requests
+    share the cache lookup and retrieval and then stream their own answer.
+    """
+    started = time.perf_counter()
+    validate_retrieval_options(top_k, dense_weight, lexical_weight)
+    scope = cache_scope(top_k, dense_weight, lexical_weight, rerank, doc_ids)
+    flight_key = (tenant, normalize_query(query), scope)
+    args = (tenant, scope, query, top_k, dense_weight, lexical_weight, rerank)
+    tenant_filter = {"user_id": user_id, "api_key": api_key, "doc_ids": doc_ids}
+
+    if not stream:
+        answer = await single_flight.do(
+            flight_key, lambda: answer_query(build_prompt, *args, **tenant_filter))
+        return {"llm_response": answer["llm_response"]}
+
+    prepared = await single_flight.do(
+        flight_key + ("prepare",), lambda: prepare_answer(*args, **tenant_filter))
+    if "cached" in prepared:
+        return cached_answer_response(prepared["cached"], stream, started)
+    context_text, hits = build_context(prepared["hits"], query, build_prompt)
+    remember = answer_cache_writer(tenant, prepared["query_vector"], scope, hits, prepared["generation"])
+    timings = {"retrieval_ms": prepared["retrieval_ms"]}
+    return stream_llm_response(build_prompt(context_text, query), hits, started, timings, on_complete=remember)
+
+@app.post("/query_llm")
+async def query_llm(
+    user_id: str = Form(...),
+    query: str = Form(...),
+    top_k: int = Form(None),
+    dense_weight: float = Form(1.0),
+    lexical_weight: float = Form(1.0),
+    rerank: bool = Form(RERANK_ENABLED),
+    stream: bool = Form(False),
+    doc_ids: str = Form(None)
+):
+    print(GROQ_API_KEY)
+    if not GROQ_API_KEY:
+        raise HTTPException(status_code=500, detail="Set GROQ_API_KEY in environment.")
+    print(user_id+" "+query,end="\n")
+    await run_in_threadpool(ensure_collection)
+    # Optional document scope, pushed down to the vector store as a doc_id filter
+    doc_list = parse_doc_ids(doc_ids)
+    doc_scope = user_doc_ids(user_id, doc_list) if doc_list else None
+
+    try:
+        return await answer_or_stream(user_prompt, user_tenant(user_id), query, top_k, dense_weight,
+                                      lexical_weight, rerank, stream, user_id=user_id, doc_ids=doc_scope)
+    except LLMError as e:
+        error_text = e.text
 
         if "Request too large" in error_text or "413" in error_text:
             return {
@@ -158,19 +401,7 @@ Answer:
                 "llm_response": "⚠ Request exceeded 6000 token limit. Try reducing context or question size."
             }
         else:
-            raise HTTPException(status_code=500, detail=f"Groq API call failed: {resp.status_code} {error_text}")
-
-
-    result = resp.json()
-    output_texts = []
-    for item in result.get("output", []):
-        for c in item.get("content", []):
-            if c.get("type") == "output_text":
-                output_texts.append(c.get("text").strip())
-
-    llm_response = " ".join(output_texts).strip()
-
-    return {"llm_response": llm_response}
+            raise HTTPException(status_code=500, detail=f"Groq API call failed: {e.status_code} {error_text}")
 
 
 router = APIRouter()
@@ -189,97 +420,140 @@ def validate_api_key(api_key: str = Form(...)):
 @app.post("/query_llm_api")
 async def query_llm_api(
     query: str = Form(...),
-    api_key: str = Depends(validate_api_key)
+    api_key: str = Depends(validate_api_key),
+    top_k: int = Form(None),
+    dense_weight: float = Form(1.0),
+    lexical_weight: float = Form(1.0),
+    rerank: bool = Form(RERANK_ENABLED),
+    stream: bool = Form(False),
+    doc_ids: str = Form(None)
 ):
     """
     External API endpoint for LLM query using API Key authentication.
+    `doc_ids` narrows the search to some of the key's documents.
+    Identical concurrent questions for the same key share one pipeline run.
     """
     if not GROQ_API_KEY:
         raise HTTPException(status_code=500, detail="Server misconfigured: GROQ_API_KEY not set")
 
-    # 1️⃣ Fetch relevant chunks from vector DB based on api_key
-    chunks = query_embeddings(api_key=api_key, query_text=query)
-    if not chunks:
-        raise HTTPException(status_code=404, detail="No relevant context found in vector DB.")
-
-    context_text = "\n\n".join(chunks)
-
-    # 2️⃣ Prepare prompt for LLM
-    prompt = f"""
-You are a helpful assistant. Use the context below to answer the question.
-Provide only one to four concise sentences as the answer. Do NOT include reasoning, steps, or extra text.
-
-Context:
-{context_text}
-
-Question: {query}
-Answer:
-"""
-
-    # 3️⃣ Call Groq LLM
-    headers = {"Authorization": f"Bearer {GROQ_API_KEY}"}
-    payload = {
-        "model": "llama-3.1-8b-instant",
-        "input": prompt,
-        "temperature": 0.2,
-        "max_output_tokens": 512
-    }
-
-    resp = requests.post(GROQ_ENDPOINT, headers=headers, json=payload)
-    if resp.status_code != 200:
-        raise HTTPException(status_code=500, detail=f"Groq API call failed: {resp.status_code} {resp.text}")
-
-    result = resp.json()
-    output_texts = [
-        c.get("text").strip()
-        for item in result.get("output", [])
-        for c in item.get("content", [])
-        if c.get("type") == "output_text"
-    ]
-
-    llm_response = " ".join(output_texts).strip()
-    return {"llm_response": llm_response}
+    # The key selects documents of its owner's vectors; keys unknown to Mongo, or whose documents
+    # were only embedded before vectors carried a doc_id, keep their legacy per-key vectors
+    key_scope = await run_in_threadpool(api_key_scopes.resolve, api_key)
+    doc_list = parse_doc_ids(doc_ids)
+    if key_scope is not None and not key_scope.legacy:
+        doc_scope = key_scope.doc_ids
+        if doc_list:
+            doc_scope = tuple(d for d in user_doc_ids(key_scope.user_id, doc_list) if d in key_scope.doc_ids)
+            if not doc_scope:
+                raise HTTPException(status_code=403, detail="None of the requested documents belong to this API key")
+        tenant = user_tenant(key_scope.user_id)
+        tenant_filter = {"user_id": key_scope.user_id, "doc_ids": doc_scope}
+    else:
+        tenant = api_key_tenant(api_key)
+        tenant_filter = {"api_key": api_key, "doc_ids": tuple(sorted(set(doc_list))) if doc_list else None}
+
+    # Cached answer -> fused retrieval (chunks of the key's documents) -> Groq LLM
+    try:
+        return await answer_or_stream(api_prompt, tenant, query, top_k, dense_weight,
+                                      lexical_weight, rerank, stream, **tenant_filter)
+    except LLMError as e:
+        if e.status_code == 429:
+            # Shed by the scheduler or still limited after retries: let the client back off
+            headers = {"Retry-After": str(max(1, round(e.retry_after)))} if e.retry_after else None
+            raise HTTPException(status_code=429, detail=f"LLM rate limit: {e.text}", headers=headers)
+        raise HTTPException(status_code=500, detail=f"Groq API call failed: {e.status_code} {e.text}")
 
 @app.post("/embed_existing")
 async def embed_existing(
     user_id: str = Form(...),
-    api_key: str = Form(...),
+    api_key: str = Form(None),  # unused: vectors are stored per user, API keys select documents
     filename: str = Form(...)
 ):
-    validate_fields({"user_id": user_id, "api_key": api_key, "filename": filename})
-    ensure_collection()
+    validate_fields({"user_id": user_id, "filename": filename})
 
     file_path = os.path.join(UPLOAD_DIR, f"{user_id}_{filename}")
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail=f"File not found: {file_path}")
 
-    try:
-        text = extract_text(file_path)
-        if not text.strip():
-            raise HTTPException(status_code=400, detail="No text could be extracted from the document.")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Text extraction failed: {e}")
+    job_id = await run_in_threadpool(enqueue_ingest, user_id, file_path, filename)
+    return JSONResponse(status_code=202, content={
+        "message": "Document queued for embedding",
+        "user_id": user_id,
+        "job_id": job_id,
+        "status": "queued",
+        "file_path": file_path
+    })
 
-    chunk_size = 2000
-    chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+@app.post("/reindex_document")
+async def reindex_document(
+    user_id: str = Form(...),
+    file: UploadFile = File(...)
+):
+    """
+    Replace an uploaded document with a new version and re-index it incrementally:
+    only new or changed chunks are embedded and chunks that are gone are deleted.
+    The job's result reports `added`, `kept` and `removed` chunk counts.
+    """
+    validate_fields({"user_id": user_id, "file": file.filename})
 
-    try:
-        store_embeddings(user_id, api_key, chunks)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Embedding/storage failed: {e}")
+    file_path = os.path.join(UPLOAD_DIR, f"{user_id}_{file.filename}")
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail=f"No uploaded document to update: {file.filename}")
+    await run_in_threadpool(save_upload, file, file_path)
 
-    return {
-        "message": "Document embedded successfully",
+    job_id = await run_in_threadpool(enqueue_ingest, user_id, file_path, file.filename)
+    return JSONResponse(status_code=202, content={
+        "message": "Document update queued for re-indexing",
         "user_id": user_id,
-        "num_chunks": len(chunks),
+        "job_id": job_id,
+        "status": "queued",
         "file_path": file_path
-    }
+    })
+
+# --- Ingestion job status ---
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = await run_in_threadpool(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 # --- Health Check ---
 @app.get("/health")
 async def health_check():
     return {"status": "ok", "collection_initialized": COLLECTION_INIT}
 
+# --- Readiness (model loaded, vector store reachable, collection ready) ---
+@app.get("/ready")
+async def readiness_check():
+    store_ok = await run_in_threadpool(vector_store_ready)
+    ready = engine.is_loaded and store_ok and COLLECTION_INIT
+    body = {
+        "ready": ready,
+        "model_loaded": engine.is_loaded,
+        "vector_store": store_ok,
+        "collection_initialized": COLLECTION_INIT,
+        "startup": STARTUP,
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
+# --- Metrics ---
+@app.get("/metrics")
+async def metrics():
+    return {
+        "embedding": engine.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "query_encoder": query_encoder.stats(),
+        "reranker": reranker.stats(),
+        "llm": llm_client.stats(),
+        "semantic_cache": semantic_cache.stats(),
+        "api_keys": api_key_scopes.stats(),
+        "single_flight": single_flight.stats(),
+        "jobs": job_queue.stats(),
+        "ocr": ocr_stats(),
+        "extraction_cache": extraction_cache.stats(),
+    }
+
 # from fastapi import FastAPI
 # from fastapi.middleware.cors import CORSMiddleware
 # from backend.routes import documents, chat, users , apikeys
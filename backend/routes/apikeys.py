@@ -55,8 +55,10 @@ from typing import List
 from bson import ObjectId
 import secrets
 from backend.database.mongo import save_api_key
-from backend.utils.extract_text import extract_text
-from backend.utils.embed_store import store_embeddings, init_collection  # We'll use this
+from fastapi.concurrency import run_in_threadpool
+from backend.utils.embed_store import document_id, document_embedded
+from backend.utils.ingest import enqueue_ingest
+from backend.utils.api_key_scope import api_key_scopes
 from backend.database.mongo import get_api_keys_by_user
 
 router = APIRouter()
@@ -107,24 +109,24 @@ async def generate_api_key_route(request: APIKeyRequest):
     # Save to MongoDB
     save_api_key(str(user_object_id), api_key, documents)
 
+    api_key_scopes.invalidate(api_key)
+
     # -------------------------------
-    # Embed and store documents
+    # Vectors are shared by all of the user's keys: only queue documents not embedded yet,
+    # and join the upload's ingest job when it is still queued or running
     # -------------------------------
+    jobs = []
     for doc in documents:
-        file_path = doc["path"]
-        try:
-            text = extract_text(file_path)  # Extract text from PDF/DOCX
-            # store_embeddings(str(user_object_id), api_key, [text])  # Wrap text in list
-            chunk_size = 2000
-            chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
-            store_embeddings(str(user_object_id), api_key, chunks)
-
-        except Exception as e:
-            print(f"Failed to process {file_path}: {e}")
-
+        doc_id = document_id(doc["path"])
+        if await run_in_threadpool(document_embedded, str(user_object_id), doc_id):
+            continue
+        job_id = await run_in_threadpool(
+            enqueue_ingest, str(user_object_id), doc["path"], doc["filename"], join_running=True)
+        jobs.append({"doc_id": doc_id, "job_id": job_id})
 
     return {
-        "message": "API key generated successfully and documents embedded",
+        "message": "API key generated successfully",
         "api_key": api_key,
-        "documents": documents
+        "documents": documents,
+        "jobs": jobs
     }
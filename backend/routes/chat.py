@@ -107,24 +107,22 @@
 #         return {"success": True, "chats": chats}
 #     except Exception as e:
 #         raise HTTPException(status_code=500, detail=f"Failed to fetch chat history: {str(e)}")
-from fastapi import APIRouter, Body, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
 from fastapi.responses import JSONResponse
-from datetime import datetime
 from bson import ObjectId
-from typing import Optional, List, Dict
-import os
+from typing import Optional, List
+
+from fastapi.concurrency import run_in_threadpool
 
 from backend.database.mongo import (
     save_chat_message,
     get_user_chat_history,
-    documents_collection,  # Mongo collection for documents
 )
 from backend.utils.auth import get_current_user  # JWT helper
+from backend.utils.embed_store import retrieve, user_doc_ids
 
 router = APIRouter()
 
-UPLOAD_DIR = "./public/uploaded_files"
-
 
 # Placeholder for actual retrieval-augmented generation logic
 def rag_generate_answer(query: str, document_texts: List[str]) -> str:
@@ -142,56 +140,40 @@ def rag_generate_answer(query: str, document_texts: List[str]) -> str:
 @router.post("/")
 async def chat(
     message: str = Body(...),
+    doc_ids: Optional[List[str]] = Query(None),
+    top_k: int = Query(5, ge=1, le=20),
     current_user: dict = Depends(get_current_user)
 ):
+    """
+    Answer from the user's most relevant chunks. The body stays the raw message
+    string; the `doc_ids` query parameter (repeated or comma-separated document
+    ids or file names) restricts the search to those documents.
+    """
     user_id = str(current_user["_id"])
+    doc_ids = [d.strip() for value in doc_ids or [] for d in value.split(",") if d.strip()]
 
     try:
-        # 1. Query user documents metadata from MongoDB
-        docs_cursor = documents_collection.find({"userId": ObjectId(user_id)})
-        docs = list(docs_cursor)
-
-        if not docs:
-            return JSONResponse(
-                status_code=404,
-                content={"error": "No documents found for user to answer query."}
-            )
+        # 1. Retrieve the best chunks of the user's (selected) documents
+        doc_scope = user_doc_ids(user_id, doc_ids) if doc_ids else None
+        hits = await run_in_threadpool(
+            retrieve, user_id=user_id, doc_ids=doc_scope, query_text=message, top_k=top_k
+        )
 
-        # 2. Read document contents from disk
-        document_texts = []
-        sources = []
-        for doc in docs:
-            filename = doc.get("filename")
-            # Construct full file path
-            file_path = os.path.join(UPLOAD_DIR, f"{user_id}_{filename}")
-
-            if not os.path.isfile(file_path):
-                continue
-
-            # Read text content - assuming plain text or extract your own method for PDFs etc.
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    text_content = f.read()
-                    document_texts.append(text_content)
-                    sources.append(filename)
-            except Exception as e:
-                # Log and skip files that fail to read
-                print(f"Warning: failed to read {file_path}: {str(e)}")
-                continue
-
-        if not document_texts:
+        if not hits:
             return JSONResponse(
                 status_code=404,
-                content={"error": "User documents exist but none could be read."}
+                content={"error": "No relevant content found in the user's documents."}
             )
 
-        # 3. Use RAG and LLM to generate response based on document texts
+        # 2. Use RAG and LLM to generate response based on the retrieved chunks
+        document_texts = [h["payload"]["text"] for h in hits]
+        sources = list(dict.fromkeys(h["payload"].get("doc_id") for h in hits))
         answer = rag_generate_answer(message, document_texts)
 
-        # 4. Save chat history (user message + generated answer)
+        # 3. Save chat history (user message + generated answer)
         chat_id = save_chat_message(user_id, message, answer)
 
-        # 5. Return the answer and optionally the source document names
+        # 4. Return the answer and the source documents
         return {
             "response": answer,
             "sources": sources,
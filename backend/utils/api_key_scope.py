@@ -0,0 +1,86 @@
+# api_key_scope.py
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from backend.config import API_KEY_CACHE_TTL_SECONDS, API_KEY_CACHE_SIZE
+from backend.database.mongo import get_api_key
+from .embed_store import document_id, has_vectors
+
+
+class KeyScope(NamedTuple):
+    """
+    What an API key may search: its owner's vectors, restricted to these
+    documents. `legacy` keys still search the vectors stamped with the key
+    because their documents were embedded before vectors carried a doc_id.
+    """
+    user_id: str
+    doc_ids: tuple
+    legacy: bool = False
+
+
+def key_scope(record: dict) -> KeyScope:
+    user_id = str(record["user_id"])
+    doc_ids = {
+        document_id(d["path"]) if d.get("path") else f"{user_id}_{d['filename']}"
+        for d in record.get("documents") or []
+    }
+    return KeyScope(user_id, tuple(sorted(doc_ids)))
+
+
+def legacy_only(api_key: str, scope: KeyScope) -> bool:
+    """True when none of the key's documents has doc_id-tagged vectors but vectors stamped with the key exist."""
+    if scope.doc_ids and has_vectors({"user_id": scope.user_id, "doc_id": list(scope.doc_ids)}):
+        return False
+    return has_vectors({"api_key": api_key})
+
+
+class ApiKeyScopes:
+    """
+    Resolves API keys to a KeyScope from the APIKeys collection. Vectors are
+    stored once per user, so a key is only a document filter over its
+    owner's vectors, until its documents are re-embedded per user (see
+    KeyScope.legacy). Lookups (including unknown keys, which map to None) are
+    cached for `ttl_seconds` so the query path does not hit Mongo every time.
+    """
+
+    def __init__(self, ttl_seconds: float = API_KEY_CACHE_TTL_SECONDS, max_entries: int = API_KEY_CACHE_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._items = OrderedDict()  # key -> (expires_at, KeyScope | None)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, api_key: str):
+        """KeyScope of `api_key`, or None for a key that is not in Mongo (legacy per-key vectors)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._items.get(api_key)
+            if entry is not None and entry[0] > now:
+                self._items.move_to_end(api_key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        record = get_api_key(api_key)
+        scope = key_scope(record) if record else None
+        if scope is not None and legacy_only(api_key, scope):
+            scope = scope._replace(legacy=True)
+        with self._lock:
+            self._items[api_key] = (now + self.ttl_seconds, scope)
+            self._items.move_to_end(api_key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+        return scope
+
+    def invalidate(self, api_key: str) -> None:
+        with self._lock:
+            self._items.pop(api_key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._items), "hits": self.hits, "misses": self.misses}
+
+
+api_key_scopes = ApiKeyScopes()
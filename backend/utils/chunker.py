@@ -0,0 +1,213 @@
+# chunker.py
+import re
+from typing import NamedTuple
+
+from backend.config import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS, CHUNK_MIN_TOKENS
+
+_PARAGRAPH_RE = re.compile(r"\n[ \t\r\f\v]*\n\s*")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])[\"')\]]*\s+")
+_LINE_RE = re.compile(r"\n")
+_WORD_RE = re.compile(r"\S+")
+
+
+class Chunk(NamedTuple):
+    """
+    One chunk of a document. `char_start`/`char_end` index the document text
+    as its pages joined with "\n"; `text` is exactly that slice.
+    """
+    ordinal: int
+    text: str
+    char_start: int
+    char_end: int
+    tokens: int
+
+    def payload(self) -> dict:
+        """Fields stored with the chunk's vector next to its text."""
+        return {"ordinal": self.ordinal, "char_start": self.char_start, "char_end": self.char_end}
+
+
+class _Unit(NamedTuple):
+    lead: str        # document text between the previous unit and this one
+    text: str
+    start: int
+    end: int
+    tokens: int
+    paragraph: bool  # first unit of a paragraph
+
+
+class ModelTokenizer:
+    """Token counts and spans from the embedding model's (fast) tokenizer, without special tokens."""
+
+    def __init__(self, tokenizer, max_tokens: int = None):
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+
+    def lengths(self, texts: list) -> list:
+        if not texts:
+            return []
+        encoded = self.tokenizer(texts, add_special_tokens=False, return_attention_mask=False,
+                                 return_token_type_ids=False, verbose=False)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def spans(self, text: str) -> list:
+        encoded = self.tokenizer(text, add_special_tokens=False, return_attention_mask=False,
+                                 return_token_type_ids=False, return_offsets_mapping=True, verbose=False)
+        return [tuple(span) for span in encoded["offset_mapping"]]
+
+
+class WordTokenizer:
+    """Whitespace words as tokens; for benchmarks and tests that must not load the model."""
+
+    max_tokens = None
+
+    def lengths(self, texts: list) -> list:
+        return [len(text.split()) for text in texts]
+
+    def spans(self, text: str) -> list:
+        return [m.span() for m in _WORD_RE.finditer(text)]
+
+
+_model_tokenizer = None
+
+
+def model_tokenizer() -> ModelTokenizer:
+    """Tokenizer of the embedding model, capped at what the model reads (its max sequence length)."""
+    global _model_tokenizer
+    if _model_tokenizer is None:
+        from .embedding_engine import engine
+
+        model = engine.model
+        # [CLS] and [SEP] take two positions of the sequence
+        _model_tokenizer = ModelTokenizer(model.tokenizer, max_tokens=model.max_seq_length - 2)
+    return _model_tokenizer
+
+
+def _pieces(text: str, separator, start: int, end: int):
+    """(start, end) of the non-blank pieces of text[start:end] between separators, whitespace trimmed."""
+    pos = start
+    for m in separator.finditer(text, start, end):
+        if m.start() > pos:
+            yield from _trimmed(text, pos, m.start())
+        pos = max(pos, m.end())
+    yield from _trimmed(text, pos, end)
+
+
+def _trimmed(text: str, start: int, end: int):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    if start < end:
+        yield start, end
+
+
+def _token_windows(text: str, start: int, end: int, max_tokens: int, tokenizer):
+    """Cut text[start:end] every `max_tokens` tokens, preferring a cut between words."""
+    spans = tokenizer.spans(text[start:end])
+    i = 0
+    while i < len(spans):
+        j = min(i + max_tokens, len(spans))
+        if j < len(spans):
+            for k in range(j, i + max_tokens // 2, -1):
+                if spans[k - 1][1] < spans[k][0]:
+                    j = k
+                    break
+        yield start + spans[i][0], start + spans[j - 1][1], j - i
+        i = j
+
+
+def _fit(text: str, start: int, end: int, tokens: int, max_tokens: int, tokenizer):
+    """Split a sentence longer than `max_tokens` at line breaks, then between tokens."""
+    if tokens <= max_tokens:
+        yield start, end, tokens
+        return
+    lines = list(_pieces(text, _LINE_RE, start, end))
+    if len(lines) == 1:
+        yield from _token_windows(text, start, end, max_tokens, tokenizer)
+        return
+    group = None
+    for (s, e), n in zip(lines, tokenizer.lengths([text[s:e] for s, e in lines])):
+        if n > max_tokens:
+            if group:
+                yield group
+                group = None
+            yield from _token_windows(text, s, e, max_tokens, tokenizer)
+        elif group and group[2] + n <= max_tokens:
+            group = (group[0], e, group[2] + n)
+        else:
+            if group:
+                yield group
+            group = (s, e, n)
+    if group:
+        yield group
+
+
+def _iter_units(pages, max_tokens: int, tokenizer):
+    """Sentences of the document (oversized ones split), one page tokenized per call."""
+    offset, lead = 0, ""
+    for number, page in enumerate(pages):
+        if number:
+            lead += "\n"
+        spans = [
+            (s, e, p == 0)
+            for ps, pe in _pieces(page, _PARAGRAPH_RE, 0, len(page))
+            for p, (s, e) in enumerate(_pieces(page, _SENTENCE_RE, ps, pe))
+        ]
+        previous_end = 0
+        lengths = tokenizer.lengths([page[s:e] for s, e, _ in spans])
+        for (start, end, paragraph), tokens in zip(spans, lengths):
+            for s, e, n in _fit(page, start, end, tokens, max_tokens, tokenizer):
+                yield _Unit(lead + page[previous_end:s], page[s:e], offset + s, offset + e, n, paragraph)
+                paragraph, lead, previous_end = False, "", e
+        lead += page[previous_end:]
+        offset += len(page) + 1
+
+
+def _chunk(ordinal: int, units: list) -> Chunk:
+    text = units[0].text + "".join(u.lead + u.text for u in units[1:])
+    return Chunk(ordinal, text, units[0].start, units[-1].end, sum(u.tokens for u in units))
+
+
+def iter_chunks(pages, max_tokens: int = CHUNK_MAX_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+                min_tokens: int = CHUNK_MIN_TOKENS, tokenizer=None):
+    """
+    Stream Chunks of up to `max_tokens` embedding-model tokens from an
+    iterable of page texts. Chunks end on sentence boundaries (line breaks,
+    then token boundaries, for a sentence that does not fit on its own). A
+    page or paragraph break ends the chunk once it holds `min_tokens`, and the
+    next chunk starts fresh, so an edit only moves the chunks of its own paragraph.
+    A chunk cut inside a paragraph repeats up to `overlap_tokens` of trailing
+    sentences at the start of the next one.
+    """
+    tokenizer = tokenizer or model_tokenizer()
+    if tokenizer.max_tokens:
+        max_tokens = min(max_tokens, tokenizer.max_tokens)
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+
+    ordinal, current, current_tokens = 0, [], 0
+    for unit in _iter_units(pages, max_tokens, tokenizer):
+        if current and unit.paragraph and current_tokens >= min_tokens:
+            yield _chunk(ordinal, current)
+            ordinal, current, current_tokens = ordinal + 1, [], 0
+        elif current and current_tokens + unit.tokens > max_tokens:
+            yield _chunk(ordinal, current)
+            ordinal += 1
+            # Carry whole trailing sentences, never the entire previous chunk
+            tail, tail_tokens = [], 0
+            for previous in reversed(current[1:]):
+                if tail_tokens + previous.tokens > overlap_tokens:
+                    break
+                tail.insert(0, previous)
+                tail_tokens += previous.tokens
+            while tail and tail_tokens + unit.tokens > max_tokens:
+                tail_tokens -= tail.pop(0).tokens
+            current, current_tokens = tail, tail_tokens
+        current.append(unit)
+        current_tokens += unit.tokens
+    if current:
+        yield _chunk(ordinal, current)
+
+
+def chunk_text(text: str, **options) -> list:
+    """All chunks of one text; see iter_chunks."""
+    return list(iter_chunks([text], **options))
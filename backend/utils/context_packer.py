@@ -0,0 +1,105 @@
+# context_packer.py
+import os
+import re
+from functools import lru_cache
+
+from backend.config import (
+    CONTEXT_TOKENIZER,
+    CONTEXT_TOKENIZER_CACHE,
+    CONTEXT_DEDUP_THRESHOLD,
+    CONTEXT_MIN_CHUNK_TOKENS,
+    LLM_TOKEN_BUDGET,
+    LLM_MAX_OUTPUT_TOKENS,
+)
+
+SEPARATOR = "\n\n"
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+# Token estimate when the encoding can't be loaded (e.g. offline before it was ever downloaded)
+_CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    """The tiktoken encoding, read from CONTEXT_TOKENIZER_CACHE after the first download; None if unavailable."""
+    os.environ.setdefault("TIKTOKEN_CACHE_DIR", CONTEXT_TOKENIZER_CACHE)
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(CONTEXT_TOKENIZER)
+    except Exception as e:
+        print(f"[WARN] Tokenizer {CONTEXT_TOKENIZER} unavailable, estimating {_CHARS_PER_TOKEN} chars per token: {e}")
+        return None
+
+
+def load_encoding() -> None:
+    """Load the encoding up front (tiktoken may read or download it) instead of on the first request."""
+    _encoding()
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return -(-len(text) // _CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """First `max_tokens` tokens of `text`, cut back to a sentence end when one is close."""
+    encoding = _encoding()
+    if encoding is None:
+        if len(text) <= max_tokens * _CHARS_PER_TOKEN:
+            return text
+        head = text[:max_tokens * _CHARS_PER_TOKEN]
+    else:
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        head = encoding.decode(tokens[:max_tokens])
+    cut = max(head.rfind(". "), head.rfind("\n"))
+    return head[:cut + 1].rstrip() if cut > len(head) // 2 else head
+
+
+def _normalize(sentence: str) -> str:
+    return " ".join(sentence.lower().split())
+
+
+def pack_context(hits: list, query: str, build_prompt, budget: int = LLM_TOKEN_BUDGET,
+                 max_output_tokens: int = LLM_MAX_OUTPUT_TOKENS):
+    """
+    Fill the prompt's context with as much of the ranked `hits` as the token
+    budget allows, best first. Room for the prompt template, the question and
+    the answer is reserved up front. Sentences already in the context (e.g.
+    chunk overlap) are removed; a chunk that is mostly repeats is dropped.
+    The first chunk that does not fit is trimmed to the remaining room, or left
+    out when that room is too small to be useful.
+    Returns (context_text, packed_hits, context_tokens).
+    """
+    available = budget - max_output_tokens - count_tokens(build_prompt("", query))
+    separator_tokens = count_tokens(SEPARATOR)
+    seen, parts, packed, used = set(), [], [], 0
+
+    for hit in hits:
+        text = hit["payload"]["text"]
+        sentences = [s for s in _SENTENCE_RE.split(text) if s.strip()]
+        fresh = [s for s in sentences if _normalize(s) not in seen]
+        if not fresh or sum(map(len, fresh)) < (1 - CONTEXT_DEDUP_THRESHOLD) * sum(map(len, sentences)):
+            continue
+        if len(fresh) < len(sentences):
+            text = " ".join(s.strip() for s in fresh)
+
+        room = available - used - (separator_tokens if parts else 0)
+        tokens = count_tokens(text)
+        if tokens > room:
+            if room < CONTEXT_MIN_CHUNK_TOKENS:
+                break
+            text = truncate_tokens(text, room)
+            tokens = count_tokens(text)
+
+        parts.append(text)
+        packed.append(hit)
+        used += tokens + (separator_tokens if len(parts) > 1 else 0)
+        seen.update(_normalize(s) for s in fresh)
+        if used >= available - CONTEXT_MIN_CHUNK_TOKENS:
+            break
+
+    return SEPARATOR.join(parts), packed, used
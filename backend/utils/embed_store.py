@@ -1,75 +1,199 @@
 # embed_store.py
-from qdrant_client import QdrantClient
-from qdrant_client.http import models
-from qdrant_client.models import PointStruct, VectorParams, Filter, FieldCondition, MatchValue
-from sentence_transformers import SentenceTransformer
+import os
 import uuid
+import numpy as np
 
-qdrant = QdrantClient("localhost", port=6333)
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
+from .embedding_engine import engine
+from .embedding_cache import embedding_cache, text_hash
+from .query_encoder import encode_query_sync
+from .lexical_index import lexical_index
+from .semantic_cache import semantic_cache, user_tenant
+from backend.database.vector_store import get_vector_store, flush_vector_store
+from backend.config import HYBRID_DENSE_K, HYBRID_LEXICAL_K, RRF_K
+
+def vector_store_ready():
+    """True when the vector backend answers; used by the readiness probe."""
+    return get_vector_store().is_ready()
 
 def init_collection():
-    """Initialize the global collection (create only if not exists)."""
-    collections = qdrant.get_collections().collections
-    collection_names = [c.name for c in collections]
-
-    if "chatbot_embeddings" not in collection_names:
-        qdrant.create_collection(
-            collection_name="chatbot_embeddings",
-            vectors_config=models.VectorParams(size=384, distance=models.Distance.COSINE)
-        )
-        print("Created new collection: chatbot_embeddings")
-    else:
-        print("Collection already exists — reusing existing data.")
+    """Initialize the global collection (create only if not exists) and bring indexes up to date."""
+    get_vector_store().ensure_collection(engine.dimension)
+
+def document_id(file_path):
+    """Stable document id: the stored file name (`{user_id}_{filename}`)."""
+    return os.path.basename(file_path)
+
+def cache_model_key():
+    """Cache namespace: vectors from different models/backends never mix."""
+    return f"{engine.model_name}:{engine.backend}"
+
+def embed_texts(texts):
+    """Encode texts, reusing cached vectors so identical chunks are never re-encoded."""
+    model_key = cache_model_key()
+    digests = [text_hash(t) for t in texts]
+    cached = embedding_cache.get_many(model_key, digests)
+
+    # Encode each distinct missing chunk once, even if it repeats within the batch
+    missing = {}
+    for text, digest in zip(texts, digests):
+        if digest not in cached and digest not in missing:
+            missing[digest] = text
+    if missing:
+        fresh = engine.encode(list(missing.values()))
+        embedding_cache.put_many(model_key, list(missing.keys()), fresh)
+        cached.update(zip(missing.keys(), fresh))
+
+    vectors = np.empty((len(texts), engine.dimension), dtype=np.float32)
+    for i, digest in enumerate(digests):
+        vectors[i] = cached[digest]
+    return vectors
+
+# Namespace of chunk point ids; changing it re-keys every stored chunk
+POINT_ID_NAMESPACE = uuid.UUID("5b0a7c1e-2f4d-4c39-9d8e-6a1f3b2c4d5e")
+
+def point_id(user_id, doc_id, ordinal, digest):
+    """Deterministic point id of a chunk: the same chunk of the same document always gets the same id."""
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{user_id}\x1f{doc_id}\x1f{ordinal}\x1f{digest}"))
+
+def user_doc_ids(user_id, names):
+    """Sorted document ids of a user from ids or plain file names (`a.pdf` -> `{user_id}_a.pdf`)."""
+    prefix = f"{user_id}_"
+    return tuple(sorted({name if name.startswith(prefix) else prefix + name for name in names}))
+
+def has_vectors(filters):
+    """True when any stored vector matches `filters`."""
+    try:
+        return get_vector_store().count(filters=filters) > 0
+    except Exception as e:  # e.g. collection not created yet
+        print(f"[WARN] Could not count vectors for {filters}: {e}")
+        return False
+
+def document_embedded(user_id, doc_id):
+    """True when the user's vectors already include this document."""
+    return has_vectors({"user_id": user_id, "doc_id": doc_id})
 
-def store_embeddings(user_id, api_key, texts):
-    """Embed and store all chunks for a document."""
-    vectors = embedder.encode(texts)
-    print(vectors)
+def store_embeddings(user_id, texts, doc_id=None, metadata=None):
+    """
+    Embed and store all chunks for a document, once per user; API keys select
+    documents at query time. `metadata` optionally holds one dict per chunk
+    (e.g. ordinal and character offsets) merged into its payload.
+    Point ids derive from the user, document, chunk ordinal and chunk text, so
+    chunks already stored are skipped and a re-run over an unchanged file
+    writes nothing. A stored chunk whose metadata changed (its offsets moved
+    after an edit earlier in the document) is rewritten with its cached vector.
+    Returns the number of new chunks written.
+    """
+    metadata = metadata or [{} for _ in texts]
+    ids = [
+        point_id(user_id, doc_id, meta.get("ordinal", i), text_hash(text))
+        for i, (text, meta) in enumerate(zip(texts, metadata))
+    ]
+    stored = get_vector_store().get_payloads(ids)
+    fresh = [i for i, pid in enumerate(ids) if pid not in stored]
+    stale = [
+        i for i, pid in enumerate(ids)
+        if pid in stored and any(stored[pid].get(k) != v for k, v in metadata[i].items())
+    ]
+    write = fresh + stale
+    if not write:
+        return 0
+
+    vectors = embed_texts([texts[i] for i in write])
     points = [
-        PointStruct(
-            id=str(uuid.uuid4()),
-            vector=vectors[i].tolist(),
-            payload={
+        {
+            "id": ids[i],
+            "vector": vectors[n],
+            "payload": {
                 "user_id": user_id,
-                "api_key": api_key,
+                "doc_id": doc_id,
                 "text": texts[i],
+                **metadata[i],
             },
-        )
-        for i in range(len(texts))
+        }
+        for n, i in enumerate(write)
     ]
 
-    qdrant.upsert(collection_name="chatbot_embeddings", points=points)
+    get_vector_store().upsert(points)
+    lexical_index.add(points)
+    # Cached answers over this user's documents (own queries and API keys) may now be stale
+    semantic_cache.invalidate(user_tenant(user_id))
     # print(f"Stored {len(points)} chunks for {doc_id} (User: {user_id})")
+    return len(fresh)
 
-def query_embeddings(user_id=None, api_key=None, query_text=None):
-    """Retrieve top chunks for a given API key and list of documents."""
+def stored_chunks(user_id, doc_id, page_size=1024):
+    """{point_id: sha256 of the chunk text} of everything stored for a user's document."""
+    chunks, offset = {}, None
+    while True:
+        records, offset = get_vector_store().scroll(
+            filters={"user_id": user_id, "doc_id": doc_id}, limit=page_size, offset=offset
+        )
+        for r in records:
+            chunks[r["id"]] = text_hash(r["payload"].get("text", ""))
+        if offset is None:
+            return chunks
+
+def delete_chunks(user_id, ids):
+    """Delete points of a user's document from the vectors and the BM25 index."""
+    if not ids:
+        return
+    get_vector_store().delete(ids=list(ids))
+    lexical_index.delete(ids=list(ids))
+    semantic_cache.invalidate(user_tenant(user_id))
 
-    query_vector = embedder.encode([query_text])[0]
+def reciprocal_rank_fusion(ranked_lists, k=RRF_K):
+    """
+    Fuse ranked hit lists with weighted RRF: score = sum(weight / (k + rank)).
+    `ranked_lists` is [(weight, hits)]; returns hits best first with `score` replaced
+    by the fused score and the per-list ranks kept under `ranks`. Hits with the
+    same document and text (legacy per-API-key copies of a chunk) count once.
+    """
+    fused = {}
+    for list_index, (weight, hits) in enumerate(ranked_lists):
+        seen = set()
+        for rank, hit in enumerate(hits, start=1):
+            key = (hit["payload"].get("doc_id"), hit["payload"].get("text"))
+            if key in seen:
+                continue
+            seen.add(key)
+            entry = fused.setdefault(key, {**hit, "score": 0.0, "ranks": [None] * len(ranked_lists)})
+            entry["score"] += weight / (k + rank)
+            entry["ranks"][list_index] = rank
+    return sorted(fused.values(), key=lambda h: h["score"], reverse=True)
+
+def retrieve(user_id=None, api_key=None, query_text=None, query_vector=None, top_k=3,
+             dense_weight=1.0, lexical_weight=1.0, dense_k=None, lexical_k=None, doc_ids=None):
+    """
+    Hybrid retrieval: dense vector search and BM25 over the same tenant,
+    fused with reciprocal rank fusion. Returns the top_k hits
+    ({"id", "score", "payload", "ranks": [dense_rank, lexical_rank]}).
+    The tenant is a user's vectors, or the legacy vectors stamped with
+    `api_key`; `doc_ids` restricts it to those documents (any of).
+    """
     if user_id is not None:
-        # Build filter
-        filters = [
-            FieldCondition(key="user_id", match=MatchValue(value=user_id))
-        ]
-    elif api_key is not None:
-        filters = [
-            FieldCondition(key="api_key", match=MatchValue(value=api_key))
-        ]
-    # if doc_ids:
-    #     # Create OR filter for multiple doc_ids
-    #     doc_conditions = [FieldCondition(key="doc_id", match=MatchValue(value=d)) for d in doc_ids]
-    #     filters.append(Filter(should=doc_conditions))  # <- OR logic
-
-    # Wrap all in a single must Filter
-    final_filter = Filter(must=filters)
-
-    # Search Qdrant
-    results = qdrant.search(
-        collection_name="chatbot_embeddings",
-        query_vector=query_vector.tolist(),
-        query_filter=final_filter,
-        limit=3
-    )
+        filters = {"user_id": user_id}
+    else:
+        filters = {"api_key": api_key}
+    if doc_ids is not None:
+        if not doc_ids:
+            return []
+        filters["doc_id"] = list(doc_ids)
+
+    dense_hits, lexical_hits = [], []
+    if dense_weight > 0:
+        if query_vector is None:
+            query_vector = encode_query_sync(query_text)
+        dense_k = dense_k or max(top_k, HYBRID_DENSE_K)
+        dense_hits = get_vector_store().search(query_vector, limit=dense_k, filters=filters)
+    if lexical_weight > 0:
+        lexical_k = lexical_k or max(top_k, HYBRID_LEXICAL_K)
+        lexical_hits = lexical_index.search(query_text, limit=lexical_k, filters=filters)
+
+    return reciprocal_rank_fusion([(dense_weight, dense_hits), (lexical_weight, lexical_hits)])[:top_k]
+
+def query_embeddings(user_id=None, api_key=None, query_text=None, query_vector=None, top_k=3, **options):
+    """Retrieve top chunks for a given API key and list of documents."""
+    hits = retrieve(user_id=user_id, api_key=api_key, query_text=query_text,
+                    query_vector=query_vector, top_k=top_k, **options)
 
     # Extract text
-    return [r.payload["text"] for r in results]
+    return [h["payload"]["text"] for h in hits]
@@ -0,0 +1,115 @@
+# embedding_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from backend.config import EMBED_CACHE_PATH, EMBED_CACHE_MAX_ENTRIES
+
+# SQLite caps the number of bound parameters per statement
+_SQL_BATCH = 500
+
+
+def text_hash(text: str) -> str:
+    """sha256 of a chunk's text, used as its content key."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent (model name, sha256 of text) -> vector cache.
+    Backed by a single SQLite file so it survives restarts and is shared by
+    every worker on the host; the least recently used rows are evicted once
+    the table grows past `max_entries`.
+    """
+
+    def __init__(self, path: str = EMBED_CACHE_PATH, max_entries: int = EMBED_CACHE_MAX_ENTRIES):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(model: str, digest: str) -> str:
+        return f"{model}:{digest}"
+
+    def get_many(self, model: str, digests: list) -> dict:
+        """Return {digest: vector} for every digest that is cached."""
+        found = {}
+        unique = list(dict.fromkeys(digests))
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(unique), _SQL_BATCH):
+                keys = [self._key(model, d) for d in unique[i:i + _SQL_BATCH]]
+                marks = ",".join("?" * len(keys))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", keys
+                ).fetchall()
+                for key, blob in rows:
+                    found[key.rsplit(":", 1)[1]] = np.frombuffer(blob, dtype=np.float32)
+                if rows:
+                    hit_keys = [k for k, _ in rows]
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE key IN ({','.join('?' * len(hit_keys))})",
+                        [now, *hit_keys],
+                    )
+            self._conn.commit()
+            hits = sum(1 for d in digests if d in found)
+            self.hits += hits
+            self.misses += len(digests) - hits
+        return found
+
+    def put_many(self, model: str, digests: list, vectors) -> None:
+        """Store vectors for the given digests, then evict down to the size bound."""
+        now = time.time()
+        rows = [
+            (self._key(model, d), np.asarray(v, dtype=np.float32).tobytes(), now)
+            for d, v in zip(digests, vectors)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+            self.evictions += excess
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+embedding_cache = EmbeddingCache()
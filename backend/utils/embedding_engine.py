@@ -0,0 +1,124 @@
+# embedding_engine.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from backend.config import (
+    EMBED_MODEL_NAME,
+    EMBED_BATCH_SIZE,
+    EMBED_WORKERS,
+    EMBED_BACKEND,
+    EMBED_ONNX_FILE,
+)
+
+
+class EmbeddingEngine:
+    """
+    Batched sentence embedding on a bounded worker pool.
+    Ingestion and query paths share one engine, so the number of concurrent
+    model calls never exceeds `workers` no matter how many requests are in flight.
+    The model (and torch) is loaded on first use, not at import.
+    """
+
+    def __init__(
+        self,
+        model_name: str = EMBED_MODEL_NAME,
+        batch_size: int = EMBED_BATCH_SIZE,
+        workers: int = EMBED_WORKERS,
+        backend: str = EMBED_BACKEND,
+    ):
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.backend = backend
+        self._model = None
+        self._load_lock = threading.Lock()
+        self.load_seconds = None
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="embed")
+        self._stats_lock = threading.Lock()
+        self._chunks = 0
+        self._batches = 0
+        self._seconds = 0.0
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    self._model = self._load_model()
+                    self.load_seconds = time.perf_counter() - start
+                    print(f"[embed] loaded {self.model_name} ({self.backend}) in {self.load_seconds:.2f}s")
+        return self._model
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def _load_model(self):
+        from sentence_transformers import SentenceTransformer
+
+        if self.backend == "onnx":
+            # Quantized int8 export shipped with all-MiniLM-L6-v2, CPU only
+            return SentenceTransformer(
+                self.model_name,
+                backend="onnx",
+                model_kwargs={"file_name": EMBED_ONNX_FILE, "provider": "CPUExecutionProvider"},
+            )
+        return SentenceTransformer(self.model_name, device="cpu")
+
+    def _encode_batch(self, texts: list) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        ).astype(np.float32, copy=False)
+
+    def encode(self, texts: list) -> np.ndarray:
+        """Encode texts in batches on the worker pool; returns an (n, dim) float32 matrix."""
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        start = time.perf_counter()
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        futures = [self._pool.submit(self._encode_batch, batch) for batch in batches]
+        vectors = np.vstack([f.result() for f in futures])
+        elapsed = time.perf_counter() - start
+
+        with self._stats_lock:
+            self._chunks += len(texts)
+            self._batches += len(batches)
+            self._seconds += elapsed
+
+        if len(texts) > 1:
+            print(f"[embed] {len(texts)} chunks in {elapsed:.2f}s ({len(texts) / max(elapsed, 1e-9):.1f} chunks/sec)")
+        return vectors
+
+    def warm_up(self) -> None:
+        """Load the model and run one tiny encode so the first request is not the slow one."""
+        self.model.encode(["warm-up"], show_progress_bar=False)
+
+    def stats(self) -> dict:
+        """Cumulative throughput counters for this engine."""
+        with self._stats_lock:
+            return {
+                "model": self.model_name,
+                "backend": self.backend,
+                "loaded": self.is_loaded,
+                "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+                "batch_size": self.batch_size,
+                "chunks": self._chunks,
+                "batches": self._batches,
+                "seconds": round(self._seconds, 3),
+                "chunks_per_sec": round(self._chunks / self._seconds, 1) if self._seconds else 0.0,
+            }
+
+
+engine = EmbeddingEngine()
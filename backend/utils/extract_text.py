@@ -1,5 +1,13 @@
 #extract_text.py
 import os
+import re
+import string
+import threading
+import time
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import pdfplumber
 import pytesseract
 from PIL import Image
@@ -7,71 +15,303 @@ from pdf2image import convert_from_path
 import pandas as pd
 from docx import Document
 
+from .extraction_cache import extraction_cache
+from .chunker import model_tokenizer
+from backend.config import (
+    OCR_MIN_TEXT_CHARS,
+    OCR_GARBLED_RATIO,
+    OCR_TARGET_LONG_SIDE_PX,
+    OCR_MIN_DPI,
+    OCR_MAX_DPI,
+    OCR_WORKERS,
+    OCR_DOC_CONCURRENCY,
+    CSV_READ_ROWS,
+    CSV_GROUP_TOKENS,
+    CHUNK_MAX_TOKENS,
+    CHUNK_MIN_TOKENS,
+)
 
-def extract_text_from_pdf(file_path: str) -> str:
-    """
-    Extract text, tables, and OCR text from a PDF file.
-    Works for scanned PDFs, image-based PDFs, and normal text PDFs.
-    """
-    text_chunks = []
-
-    # --- 1️⃣ Extract selectable text and tables using pdfplumber ---
-    with pdfplumber.open(file_path) as pdf:
-        for page in pdf.pages:
-            # Extract normal text
-            page_text = page.extract_text() or ""
-            if page_text.strip():
-                text_chunks.append(page_text)
-
-            # Extract tables as CSV-like text
-            tables = page.extract_tables()
-            for table in tables:
-                if table:
-                    table_text = "\n".join(
-                        [", ".join(cell if cell else "" for cell in row) for row in table]
-                    )
-                    text_chunks.append(table_text)
-
-    # --- 2️⃣ OCR for image-based or scanned PDFs ---
+# Part of the extraction cache key: bump whenever the text produced for a file changes
+EXTRACTOR_VERSION = "pages-v5"
+
+
+# --- OCR telemetry (process-wide, reported at /metrics) ---
+_ocr_lock = threading.Lock()
+_ocr_totals = {"pdf_pages": 0, "ocr_pages": 0, "ocr_seconds": 0.0, "ocr_failures": 0, "ocr_reasons": {}}
+
+
+def _record_page(reason: str = None, seconds: float = 0.0, stats: dict = None, failed: bool = False) -> None:
+    targets = [_ocr_totals] + ([stats] if stats is not None else [])
+    with _ocr_lock:
+        for target in targets:
+            target["pdf_pages"] = target.get("pdf_pages", 0) + 1
+            if failed:
+                target["ocr_failures"] = target.get("ocr_failures", 0) + 1
+            if reason is not None:
+                target["ocr_pages"] = target.get("ocr_pages", 0) + 1
+                target["ocr_seconds"] = round(target.get("ocr_seconds", 0.0) + seconds, 3)
+                reasons = target.setdefault("ocr_reasons", {})
+                reasons[reason] = reasons.get(reason, 0) + 1
+
+
+def ocr_stats() -> dict:
+    with _ocr_lock:
+        return {**_ocr_totals, "ocr_reasons": dict(_ocr_totals["ocr_reasons"])}
+
+
+# --- Per-page OCR decision ---
+_CID_RE = re.compile(r"\(cid:\d+\)")
+_EXPECTED_SYMBOLS = set(string.punctuation) | set("•–—‘’“”…°€£¥§©®™±×÷·")
+
+
+def text_layer_problem(text: str):
+    """Why a page's text layer needs OCR ("empty", "short", "garbled"), or None if it is usable."""
+    stripped = text.strip()
+    if not stripped:
+        return "empty"
+    if len(stripped) < OCR_MIN_TEXT_CHARS:
+        return "short"
+    # Fonts without a Unicode map come out as "(cid:123)" runs or private-use/control glyphs
+    cid_chars = sum(len(m) for m in _CID_RE.findall(stripped))
+    rest = [c for c in _CID_RE.sub("", stripped) if not c.isspace()]
+    odd = sum(1 for c in rest if not c.isalnum() and c not in _EXPECTED_SYMBOLS)
+    total = cid_chars + len(rest)
+    if total and (cid_chars + odd) / total > OCR_GARBLED_RATIO:
+        return "garbled"
+    return None
+
+
+def ocr_dpi(width_pt: float, height_pt: float) -> int:
+    """DPI that gives the page's long side ~OCR_TARGET_LONG_SIDE_PX pixels, within the DPI bounds."""
+    long_side_inches = max(width_pt, height_pt, 1.0) / 72.0
+    return int(min(OCR_MAX_DPI, max(OCR_MIN_DPI, OCR_TARGET_LONG_SIDE_PX / long_side_inches)))
+
+
+def _binarize(image):
+    # Convert to grayscale and enhance contrast for better OCR accuracy
+    return image.convert("L").point(lambda x: 0 if x < 150 else 255, "1")
+
+
+def ocr_pdf_page(file_path: str, page_number: int, dpi: int = 400):
+    """Rasterize a single PDF page (1-based) and OCR it; returns (text, seconds). Runs in an OCR worker."""
+    started = time.perf_counter()
+    images = convert_from_path(file_path, dpi=dpi, first_page=page_number, last_page=page_number)
     try:
-        images = convert_from_path(file_path, dpi=400)
+        text = "\n".join(pytesseract.image_to_string(_binarize(img), lang="eng") for img in images)
+    finally:
         for img in images:
-            # Convert to grayscale and enhance contrast for better OCR accuracy
-            gray = img.convert("L")
-            enhanced = gray.point(lambda x: 0 if x < 150 else 255, "1")
+            img.close()
+    return text, time.perf_counter() - started
+
+
+def ocr_image_file(file_path: str) -> str:
+    """OCR an image file. Runs in an OCR worker."""
+    with Image.open(file_path) as image:
+        return pytesseract.image_to_string(_binarize(image), lang="eng")
+
+
+# --- OCR process pool (shared by every document being extracted) ---
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_ocr_worker():
+    # Parallelism comes from the pool; one tesseract thread per worker avoids oversubscription
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def _ocr_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=OCR_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_ocr_worker,
+                )
+    return _pool
+
 
-            ocr_text = pytesseract.image_to_string(enhanced, lang="eng")
-            if ocr_text.strip():
-                text_chunks.append(ocr_text)
+def submit_ocr(fn, *args) -> Future:
+    """Run an OCR function in the pool (or inline when OCR_WORKERS is 0)."""
+    if OCR_WORKERS <= 0:
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    return _ocr_pool().submit(fn, *args)
+
+
+def shutdown_ocr_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _ocr_result(future: Future, file_path: str, number: int):
+    """(text, seconds) of a finished page OCR, or None if it failed."""
+    global _pool
+    try:
+        return future.result()
+    except BrokenProcessPool as e:
+        with _pool_lock:
+            _pool = None  # a worker died; start a fresh pool for the next submit
+        print(f"[WARN] OCR worker died on {file_path} (page {number}): {e}")
     except Exception as e:
-        print(f"[WARN] OCR failed for {file_path}: {e}")
+        print(f"[WARN] OCR failed for {file_path} (page {number}), skipping OCR: {e}")
+    return None
+
+
+def iter_pdf_pages(file_path: str, stats: dict = None):
+    """
+    Yield the text of a PDF one page at a time, in page order. A page's text
+    layer (plus its tables as CSV-like lines) is used when it looks usable;
+    pages whose layer is empty, very short or garbled are rasterized and OCR'd
+    in the OCR process pool instead, at a DPI chosen from the page size, with
+    at most OCR_DOC_CONCURRENCY pages of this document in flight. Memory stays
+    bounded by that window. OCR counts and time are added to `stats`, and
+    pages that needed OCR but only got their text layer (OCR failed or was
+    given up for the document) count as `ocr_failures`.
+    """
+    ocr_enabled = True
+    window = deque()  # (page number, text layer, problem, future or None), in page order
+    in_flight = 0
 
-    # --- 3️⃣ Combine and deduplicate ---
-    unique_text = list(dict.fromkeys([t.strip() for t in text_chunks if t.strip()]))
-    combined_text = "\n".join(unique_text)
+    def resolve(entry):
+        nonlocal ocr_enabled, in_flight
+        number, page_text, problem, future = entry
+        if future is None:
+            _record_page(None, 0.0, stats, failed=problem is not None)
+            return page_text.strip()
+        in_flight -= 1
+        result = _ocr_result(future, file_path, number)
+        if result is None:
+            # Usually poppler/tesseract missing: don't submit the remaining pages
+            ocr_enabled = False
+            _record_page(None, 0.0, stats, failed=True)
+            return page_text.strip()
+        ocr_text, seconds = result
+        _record_page(problem, seconds, stats)
+        return (ocr_text if ocr_text.strip() else page_text).strip()
 
-    return combined_text.strip()
+    def blocked() -> bool:
+        head = window[0][3]
+        return (head is not None and not head.done()
+                and in_flight < OCR_DOC_CONCURRENCY and len(window) <= 2 * OCR_DOC_CONCURRENCY)
+
+    try:
+        with pdfplumber.open(file_path) as pdf:
+            for number, page in enumerate(pdf.pages, start=1):
+                page_text = page.extract_text() or ""
+                problem = text_layer_problem(page_text)
+
+                # --- 1️⃣ Usable text layer: take it with its tables ---
+                if problem is None:
+                    segments = [page_text]
+                    for table in page.extract_tables():
+                        if table:
+                            segments.append("\n".join(
+                                [", ".join(cell if cell else "" for cell in row) for row in table]
+                            ))
+                    page_text = "\n".join(t.strip() for t in segments if t.strip())
+                dpi = ocr_dpi(page.width, page.height)
+                page.flush_cache()
+
+                # --- 2️⃣ Otherwise OCR it in the pool, keeping the weak layer if OCR finds nothing ---
+                future = None
+                if problem is not None and ocr_enabled:
+                    future = submit_ocr(ocr_pdf_page, file_path, number, dpi)
+                    in_flight += 1
+                window.append((number, page_text, problem, future))
+
+                # --- 3️⃣ Emit finished pages in order; wait on the oldest once the window is full ---
+                while window and not blocked():
+                    text = resolve(window.popleft())
+                    if text:
+                        yield text
+
+        while window:
+            text = resolve(window.popleft())
+            if text:
+                yield text
+    finally:
+        # Consumer stopped early: drop pages whose OCR has not started yet
+        for entry in window:
+            if entry[3] is not None:
+                entry[3].cancel()
+
+
+def extract_text_from_pdf(file_path: str) -> str:
+    """
+    Extract text, tables, and OCR text from a PDF file.
+    Works for scanned PDFs, image-based PDFs, and normal text PDFs.
+    """
+    return "\n".join(iter_pdf_pages(file_path)).strip()
 
 
 def extract_text_from_image(file_path: str) -> str:
     """Extract text from an image using OCR."""
-    image = Image.open(file_path)
-    gray = image.convert("L")
-    enhanced = gray.point(lambda x: 0 if x < 150 else 255, "1")
-    text = pytesseract.image_to_string(enhanced, lang="eng")
-    return text.strip()
+    return submit_ocr(ocr_image_file, file_path).result().strip()
 
 
-def extract_text_from_csv(file_path: str) -> str:
-    """Extract text content from a CSV by reading all cells."""
+def csv_group_tokens(tokenizer, group_tokens: int = CSV_GROUP_TOKENS) -> int:
+    """
+    Token budget of a CSV row group. The chunker closes a chunk at a page
+    break once it holds CHUNK_MIN_TOKENS, so a group that fits in what is left
+    after that is never cut and no chunk loses the header.
+    """
+    max_tokens = min(CHUNK_MAX_TOKENS, tokenizer.max_tokens or CHUNK_MAX_TOKENS)
+    return max(min(group_tokens, max_tokens - CHUNK_MIN_TOKENS), 1)
+
+
+def iter_csv_row_groups(file_path: str, read_rows: int = CSV_READ_ROWS, group_tokens: int = CSV_GROUP_TOKENS,
+                        tokenizer=None):
+    """
+    Stream a CSV as row groups of at most `group_tokens` embedding-model
+    tokens, each led by the header line so every group (and so every chunk)
+    keeps its column context; only a single row longer than that is split by
+    the chunker. The file is read `read_rows` rows at a time with every cell
+    as a string, row text is built with vectorized string ops, and malformed
+    lines are skipped.
+    """
+    tokenizer = tokenizer or model_tokenizer()
+    group_tokens = csv_group_tokens(tokenizer, group_tokens)
     try:
-        df = pd.read_csv(file_path)
-    except Exception:
-        # For malformed CSVs
-        df = pd.read_csv(file_path, engine="python", error_bad_lines=False)
+        reader = pd.read_csv(
+            file_path, dtype=str, keep_default_na=False, chunksize=read_rows,
+            on_bad_lines="skip", encoding_errors="replace",
+        )
+    except pd.errors.EmptyDataError:
+        return
 
-    text = "\n".join(df.astype(str).apply(lambda x: ", ".join(x), axis=1))
-    return text.strip()
+    with reader:
+        for frame in reader:
+            if frame.empty:
+                continue
+            columns = [str(c) for c in frame.columns]
+            header = ", ".join(columns)
+            cells = [frame[c].fillna("") for c in frame.columns]
+            rows = (cells[0].str.cat(cells[1:], sep=", ") if len(cells) > 1 else cells[0]).tolist()
+            budget = max(group_tokens - tokenizer.lengths([header])[0], 1)
+            group, used = [], 0
+            for row, tokens in zip(rows, tokenizer.lengths(rows)):
+                if group and used + tokens > budget:
+                    yield header + "\n" + "\n".join(group)
+                    group, used = [], 0
+                group.append(row)
+                used += tokens
+            if group:
+                yield header + "\n" + "\n".join(group)
+
+
+def extract_text_from_csv(file_path: str) -> str:
+    """Extract text content from a CSV: row groups, each with the header line."""
+    return "\n".join(iter_csv_row_groups(file_path)).strip()
 
 
 def extract_text_from_txt(file_path: str) -> str:
@@ -87,7 +327,7 @@ def extract_text_from_docx(file_path: str) -> str:
     return text.strip()
 
 
-def extract_text(file_path: str) -> str:
+def extract_text_uncached(file_path: str) -> str:
     """Auto-detect file type and extract text accordingly."""
     ext = os.path.splitext(file_path)[1].lower()
 
@@ -103,3 +343,43 @@ def extract_text(file_path: str) -> str:
         return extract_text_from_docx(file_path)
     else:
         raise ValueError(f"Unsupported file type: {ext}")
+
+
+def iter_pages_uncached(file_path: str, stats: dict = None):
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == ".pdf":
+        yield from iter_pdf_pages(file_path, stats)
+        return
+    if ext == ".csv":
+        yield from iter_csv_row_groups(file_path)
+        return
+    text = extract_text_uncached(file_path)
+    if text:
+        yield text
+
+
+def extractor_version() -> str:
+    """Cache key part: bump EXTRACTOR_VERSION when extraction output changes; OCR and CSV settings change it too."""
+    return (f"{EXTRACTOR_VERSION}/ocr={OCR_MIN_TEXT_CHARS},{OCR_GARBLED_RATIO},"
+            f"{OCR_TARGET_LONG_SIDE_PX},{OCR_MIN_DPI}-{OCR_MAX_DPI}"
+            f"/csv={CSV_GROUP_TOKENS},{CHUNK_MAX_TOKENS},{CHUNK_MIN_TOKENS}")
+
+
+def iter_pages(file_path: str, stats: dict = None):
+    """
+    Yield a document's text in pieces, in reading order: one page at a time
+    for PDFs, row groups for CSVs, the whole text at once for the other formats. Reads through the
+    extraction cache, so a file that was extracted before is never OCR'd again.
+    Text of a run where OCR failed on some page is not cached, so the next
+    extraction retries OCR.
+    """
+    stats = {} if stats is None else stats
+    failures_before = stats.get("ocr_failures", 0)
+    yield from extraction_cache.read_through(
+        file_path, extractor_version(), lambda: iter_pages_uncached(file_path, stats),
+        degraded=lambda: stats.get("ocr_failures", 0) > failures_before)
+
+
+def extract_text(file_path: str) -> str:
+    """Auto-detect file type and extract text accordingly (cached by file content)."""
+    return "\n".join(iter_pages(file_path)).strip()
@@ -0,0 +1,189 @@
+# extraction_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from backend.config import EXTRACT_CACHE_PATH, EXTRACT_CACHE_MAX_BYTES
+
+_READ_BATCH = 16
+# An entry still incomplete after this long was left by a crashed or abandoned extraction
+_STALE_SECONDS = 3600
+
+
+def file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Persistent cache of extracted text, one row per page, keyed by
+    (extractor version, sha256 of the file bytes). The same file uploaded
+    again, re-embedded or attached to another API key skips extraction and
+    OCR entirely. Entries only become visible once every page was written and
+    the extraction was not degraded (e.g. OCR failed); the least recently used
+    documents are evicted when the stored text grows past `max_bytes`.
+    Partial entries are dropped when their extraction stops, and ones left by
+    a crashed worker are removed after `_STALE_SECONDS`. SQLite-backed, so it
+    survives restarts and is shared by every worker on the host.
+    """
+
+    def __init__(self, path: str = EXTRACT_CACHE_PATH, max_bytes: int = EXTRACT_CACHE_MAX_BYTES):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " key TEXT PRIMARY KEY, pages INTEGER NOT NULL, bytes INTEGER NOT NULL,"
+            " complete INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " key TEXT NOT NULL, ordinal INTEGER NOT NULL, text TEXT NOT NULL, PRIMARY KEY (key, ordinal))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_last_used ON documents(last_used)")
+        self._remove_stale()
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(version: str, digest: str) -> str:
+        return f"{version}:{digest}"
+
+    def _lookup(self, key: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT complete FROM documents WHERE key = ?", (key,)).fetchone()
+            if row and row[0]:
+                self._conn.execute("UPDATE documents SET last_used = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+                return True
+        return False
+
+    def _iter_cached(self, key: str):
+        ordinal = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT ordinal, text FROM pages WHERE key = ? AND ordinal > ? ORDER BY ordinal LIMIT ?",
+                    (key, ordinal, _READ_BATCH),
+                ).fetchall()
+            if not rows:
+                return
+            for ordinal, text in rows:
+                yield text
+
+    def _discard(self, key: str) -> None:
+        self._conn.execute("DELETE FROM pages WHERE key = ?", (key,))
+        self._conn.execute("DELETE FROM documents WHERE key = ?", (key,))
+
+    def _remove_stale(self) -> None:
+        for (key,) in self._conn.execute(
+            "SELECT key FROM documents WHERE complete = 0 AND last_used < ?", (time.time() - _STALE_SECONDS,)
+        ).fetchall():
+            self._discard(key)
+
+    def _write_pages(self, key: str, pages, degraded=None):
+        """
+        Yield `pages` through while storing them; gives up caching (not yielding)
+        past the size bound, and drops the entry if the consumer stops early or
+        `degraded()` is true once the pages are exhausted.
+        """
+        with self._lock:
+            self._discard(key)
+            self._conn.execute(
+                "INSERT INTO documents (key, pages, bytes, complete, last_used) VALUES (?, 0, 0, 0, ?)",
+                (key, time.time()),
+            )
+            self._conn.commit()
+        count, size, caching, complete = 0, 0, True, False
+        try:
+            for text in pages:
+                if caching:
+                    size += len(text.encode("utf-8"))
+                    with self._lock:
+                        if size > self.max_bytes:
+                            caching = False
+                            self._discard(key)
+                        else:
+                            self._conn.execute(
+                                "INSERT OR REPLACE INTO pages (key, ordinal, text) VALUES (?, ?, ?)",
+                                (key, count, text),
+                            )
+                            self._conn.execute(
+                                "UPDATE documents SET bytes = ?, last_used = ? WHERE key = ?",
+                                (size, time.time(), key),
+                            )
+                        self._conn.commit()
+                count += 1
+                yield text
+            if caching and not (degraded and degraded()):
+                with self._lock:
+                    self._conn.execute(
+                        "UPDATE documents SET pages = ?, bytes = ?, complete = 1, last_used = ? WHERE key = ?",
+                        (count, size, time.time(), key),
+                    )
+                    self._evict()
+                    self._conn.commit()
+                complete = True
+        finally:
+            if caching and not complete:
+                with self._lock:
+                    self._discard(key)
+                    self._conn.commit()
+
+    def read_through(self, file_path: str, version: str, extract, degraded=None):
+        """
+        Yield the pages of `file_path` from the cache, or from `extract()` (a
+        page iterator) while caching them. Extraction only starts on a miss;
+        its pages are not kept when `degraded()` is true after the last one.
+        """
+        key = self._key(version, file_sha256(file_path))
+        if self._lookup(key):
+            self.hits += 1
+            yield from self._iter_cached(key)
+            return
+        self.misses += 1
+        yield from self._write_pages(key, extract(), degraded)
+
+    def _evict(self) -> None:
+        self._remove_stale()
+        total = self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM documents").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute(
+            "SELECT key, bytes FROM documents WHERE complete = 1 ORDER BY last_used"
+        ).fetchall():
+            self._discard(key)
+            self.evictions += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> dict:
+        with self._lock:
+            documents, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM documents WHERE complete = 1"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "documents": documents,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+extraction_cache = ExtractionCache()
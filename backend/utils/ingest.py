@@ -0,0 +1,193 @@
+# ingest.py
+import os
+import queue
+import threading
+from collections import Counter
+
+from backend.config import INGEST_PAGE_BUFFER
+from backend.database.mongo import set_document_status
+from .extract_text import iter_pages
+from .job_queue import job_queue
+from .embed_store import store_embeddings, stored_chunks, delete_chunks, point_id, document_id
+from .embedding_cache import text_hash
+from .chunker import iter_chunks
+
+# Chunks per store_embeddings call; progress is reported after each batch
+STORE_BATCH = 64
+
+_END = object()
+
+
+def prefetch(iterable, size: int = INGEST_PAGE_BUFFER):
+    """
+    Run `iterable` in a background thread, at most `size` items ahead of the
+    consumer, so extraction (OCR) overlaps with embedding without the two
+    drifting apart. Exceptions are re-raised in the consumer.
+    """
+    buffer = queue.Queue(maxsize=size)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                buffer.put(item)
+        except BaseException as e:
+            buffer.put(e)
+            return
+        buffer.put(_END)
+
+    thread = threading.Thread(target=produce, name="ingest-prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # Consumer gave up early: let the producer finish its current item and exit
+        stop.set()
+        while thread.is_alive():
+            try:
+                buffer.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+def ingest_document(user_id: str, file_path: str, report=None, ocr: dict = None) -> dict:
+    """
+    Extract, chunk, embed and store one uploaded file.
+    Pages stream through a bounded pipeline (extract -> chunk -> embed -> upsert),
+    so memory stays flat however long the document is. OCR telemetry of the
+    document is collected in `ocr`.
+    Re-ingesting a document (e.g. an edited version under the same name) is
+    incremental: chunks are compared by content hash with what is stored,
+    only new or changed chunks are embedded, and chunks that are gone are
+    deleted once the new version is fully stored. Returns the counts of
+    chunks, added, kept and removed.
+    """
+    report = report or (lambda stage, **counts: None)
+    ocr = {} if ocr is None else ocr
+    doc_id = document_id(file_path)
+    counts = {"pages": 0, "chunks": 0, "embedded": 0, "unchanged": 0}
+    # Content of the stored version: what is left at the end was removed
+    stored = stored_chunks(user_id, doc_id)
+    remaining = Counter(stored.values())
+    written_ids = set()
+    diff = {"added": 0, "kept": 0}
+
+    def progress():
+        report("extracting", **counts, ocr_pages=ocr.get("ocr_pages", 0), ocr_seconds=ocr.get("ocr_seconds", 0.0))
+
+    def pages():
+        for page in prefetch(iter_pages(file_path, ocr)):
+            counts["pages"] += 1
+            progress()
+            yield page
+
+    def store(batch):
+        for chunk in batch:
+            digest = text_hash(chunk.text)
+            written_ids.add(point_id(user_id, doc_id, chunk.ordinal, digest))
+            if remaining[digest] > 0:
+                remaining[digest] -= 1
+                diff["kept"] += 1
+            else:
+                diff["added"] += 1
+        written = store_embeddings(user_id, [c.text for c in batch], doc_id=doc_id,
+                                   metadata=[c.payload() for c in batch])
+        counts["embedded"] += len(batch)
+        counts["unchanged"] += len(batch) - written
+
+    def flush(batch):
+        store(batch)
+        progress()
+
+    progress()
+    batch = []
+    for chunk in iter_chunks(pages()):
+        batch.append(chunk)
+        counts["chunks"] += 1
+        if len(batch) >= STORE_BATCH:
+            flush(batch)
+            batch = []
+
+    if not counts["chunks"]:
+        raise ValueError("No text could be extracted from the document.")
+    report("embedding", chunks=counts["chunks"], embedded=counts["embedded"])
+    if batch:
+        store(batch)
+        report("embedding", embedded=counts["embedded"], unchanged=counts["unchanged"])
+
+    # Stored points the new version did not produce: removed chunks and the old ids of moved ones
+    # (a moved chunk was re-stored under its new ordinal, its vector coming from the embedding cache)
+    delete_chunks(user_id, [pid for pid in stored if pid not in written_ids])
+    return {"chunks": counts["chunks"], **diff, "removed": sum(remaining.values())}
+
+
+def _update_document(params: dict, status: str, **fields) -> None:
+    # The job must not fail because the dashboard's metadata store is unreachable
+    try:
+        set_document_status(params["user_id"], params["filename"], status, **fields)
+    except Exception as e:
+        print(f"[WARN] Could not update document status to '{status}': {e}")
+
+
+def mark_queued(job_id: str, params: dict) -> None:
+    _update_document(params, "queued", jobId=job_id)
+
+
+def run_ingest_job(params: dict, report) -> dict:
+    """Job handler for "ingest": mirrors each stage into the document's status in Mongo."""
+    def stage(status: str, **counts):
+        report(status, **counts)
+        if status != current[0]:
+            current[0] = status
+            _update_document(params, status)
+
+    current = [None]
+    ocr = {}
+    try:
+        counts = ingest_document(params["user_id"], params["file_path"], report=stage, ocr=ocr)
+    except Exception as e:
+        _update_document(params, "error", error=str(e))
+        raise
+    _update_document(params, "ready", numChunks=counts["chunks"], error=None)
+    return {
+        "num_chunks": counts["chunks"],
+        "added": counts["added"],
+        "kept": counts["kept"],
+        "removed": counts["removed"],
+        "file_path": params["file_path"],
+        "doc_id": document_id(params["file_path"]),
+        "ocr": ocr,
+    }
+
+
+def ingest_params(user_id: str, file_path: str, filename: str = None) -> dict:
+    return {
+        "user_id": user_id,
+        "file_path": os.path.abspath(file_path),
+        "filename": filename or os.path.basename(file_path),
+    }
+
+
+def ingest_key(user_id: str, file_path: str) -> str:
+    """Job key of a document: its ingest jobs run one at a time, since each diffs against what is stored."""
+    return f"{user_id}\x1f{document_id(file_path)}"
+
+
+def enqueue_ingest(user_id: str, file_path: str, filename: str = None, join_running: bool = False) -> str:
+    """
+    Queue one "ingest" job for a user's file; returns the job id. An ingest of
+    the same document still queued is reused (with `join_running`, also one
+    already running), otherwise the new job waits for the running one.
+    """
+    params = ingest_params(user_id, file_path, filename)
+    job_id = job_queue.enqueue("ingest", params, key=ingest_key(user_id, file_path), join_running=join_running)
+    mark_queued(job_id, params)
+    return job_id
@@ -0,0 +1,246 @@
+# job_queue.py
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+
+from backend.config import JOBS_DB_PATH, INGEST_WORKERS, JOB_STALE_SECONDS
+
+QUEUED = "queued"
+STARTED = "started"
+DONE = "ready"
+FAILED = "error"
+FINISHED = (DONE, FAILED)
+
+
+class JobQueue:
+    """
+    Persistent background job queue with a bounded pool of worker threads.
+    Jobs live in SQLite, so they survive restarts and every worker process on
+    the host pulls from the same queue (claiming is a single IMMEDIATE
+    transaction). A handler reports its progress through `report(stage, **counts)`:
+    the job's status becomes `stage` and the counts are merged into that stage's
+    progress entry, which also gets started/finished timestamps.
+    Jobs enqueued with the same `key` (e.g. one document) never run at the
+    same time, in any process: a worker skips a queued job while another job
+    with its key is running.
+    """
+
+    def __init__(self, path: str = JOBS_DB_PATH, workers: int = INGEST_WORKERS,
+                 stale_seconds: float = JOB_STALE_SECONDS):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.workers = workers
+        self.stale_seconds = stale_seconds
+        self._handlers = {}
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, params TEXT NOT NULL,"
+            " progress TEXT NOT NULL DEFAULT '{}', result TEXT, error TEXT,"
+            " created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+        if "key" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN key TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_key ON jobs(key, status)")
+        self.completed = 0
+        self.failed = 0
+
+    def register(self, kind: str, handler) -> None:
+        """`handler(params, report)` runs one job of `kind`; its return value is stored as the result."""
+        self._handlers[kind] = handler
+
+    # --- Producer side ---
+    def enqueue(self, kind: str, params: dict, key: str = None, join_running: bool = False) -> str:
+        """
+        Queue a job and return its id. While a job with the same `key` is still
+        queued, that job's id is returned instead (it has not read its input
+        yet); with `join_running`, so is the id of one that already started.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                existing = None
+                if key is not None and join_running:
+                    existing = self._conn.execute(
+                        "SELECT id FROM jobs WHERE key = ? AND status NOT IN (?, ?) ORDER BY created_at LIMIT 1",
+                        (key, *FINISHED),
+                    ).fetchone()
+                elif key is not None:
+                    existing = self._conn.execute(
+                        "SELECT id FROM jobs WHERE key = ? AND status = ? ORDER BY created_at LIMIT 1", (key, QUEUED)
+                    ).fetchone()
+                if existing is None:
+                    self._conn.execute(
+                        "INSERT INTO jobs (id, kind, status, params, key, created_at, updated_at)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (job_id, kind, QUEUED, json.dumps(params), key, now, now),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if existing is not None:
+            return existing[0]
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, kind, status, params, progress, result, error, created_at, updated_at"
+                " FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job_id, kind, status, params, progress, result, error, created_at, updated_at = row
+        position = None
+        if status == QUEUED:
+            with self._lock:
+                position = self._conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = ? AND created_at < ?", (QUEUED, created_at)
+                ).fetchone()[0]
+        return {
+            "id": job_id,
+            "kind": kind,
+            "status": status,
+            "params": json.loads(params),
+            "progress": json.loads(progress),
+            "result": json.loads(result) if result else None,
+            "error": error,
+            "queue_position": position,
+            "created_at": created_at,
+            "updated_at": updated_at,
+        }
+
+    # --- Worker side ---
+    def _claim(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Skip jobs whose key has a job in progress (any status but queued / finished)
+                row = self._conn.execute(
+                    "SELECT id, kind, params FROM jobs AS j WHERE status = ? AND (key IS NULL OR NOT EXISTS ("
+                    " SELECT 1 FROM jobs WHERE key = j.key AND status NOT IN (?, ?, ?)))"
+                    " ORDER BY created_at LIMIT 1",
+                    (QUEUED, QUEUED, *FINISHED),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (STARTED, time.time(), row[0])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return row
+
+    def _report(self, job_id: str, stage: str, counts: dict) -> None:
+        now = time.time()
+        with self._lock:
+            progress = json.loads(
+                self._conn.execute("SELECT progress FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+            )
+            for name, entry in progress.items():
+                if name != stage and "finished_at" not in entry:
+                    entry["finished_at"] = now
+            entry = progress.setdefault(stage, {"started_at": now})
+            entry.update(counts)
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, progress = ?, updated_at = ? WHERE id = ?",
+                (stage, json.dumps(progress), now, job_id),
+            )
+
+    def _finish(self, job_id: str, status: str, result=None, error: str = None) -> None:
+        now = time.time()
+        with self._lock:
+            progress = json.loads(
+                self._conn.execute("SELECT progress FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+            )
+            for entry in progress.values():
+                entry.setdefault("finished_at", now)
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, progress = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(progress), json.dumps(result) if result is not None else None, error, now, job_id),
+            )
+
+    def _run(self, job_id: str, kind: str, params: str) -> None:
+        handler = self._handlers.get(kind)
+        try:
+            if handler is None:
+                raise RuntimeError(f"No handler registered for job kind '{kind}'")
+            result = handler(json.loads(params), lambda stage, **counts: self._report(job_id, stage, counts))
+        except Exception as e:
+            self.failed += 1
+            print(f"[jobs] {kind} job {job_id} failed: {e}")
+            traceback.print_exc()
+            self._finish(job_id, FAILED, error=str(e))
+            self._wakeup.set()
+            return
+        self.completed += 1
+        self._finish(job_id, DONE, result=result)
+        self._wakeup.set()  # a job waiting on this one's key can run now
+
+    def _worker(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                row = self._claim()
+            except sqlite3.OperationalError as e:  # another process holds the write lock
+                print(f"[jobs] claim failed: {e}")
+                row = None
+            if row is None:
+                self._wakeup.wait(timeout=1.0)
+                self._wakeup.clear()
+                continue
+            self._run(*row)
+
+    def requeue_stale(self) -> int:
+        """Put started jobs with no progress for `stale_seconds` back in the queue."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE status NOT IN (?, ?, ?) AND updated_at < ?",
+                (QUEUED, time.time(), QUEUED, DONE, FAILED, time.time() - self.stale_seconds),
+            )
+        return cursor.rowcount
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        requeued = self.requeue_stale()
+        if requeued:
+            print(f"[jobs] requeued {requeued} stale job(s)")
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        """Stop taking new jobs; a running job finishes (or is requeued as stale after a restart)."""
+        self._stopping.set()
+        self._wakeup.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {
+            "workers": self.workers,
+            "queued": counts.get(QUEUED, 0),
+            "running": sum(n for status, n in counts.items() if status != QUEUED and status not in FINISHED),
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+job_queue = JobQueue()
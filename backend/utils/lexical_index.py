@@ -0,0 +1,133 @@
+# lexical_index.py
+import os
+import re
+import sqlite3
+import threading
+
+from backend.config import LEXICAL_INDEX_PATH
+from backend.database.vector_store import clean_filters
+
+# Payload fields kept next to the text so lexical hits can be tenant-filtered
+FILTER_FIELDS = ("user_id", "api_key", "doc_id")
+
+# Keep '-' and '_' inside tokens so part numbers and codes ("AB-1234", "SKU_9") match exactly
+_TOKENIZER = "unicode61 remove_diacritics 2 tokenchars '-_'"
+_TOKEN_RE = re.compile(r"[\w\-]+", re.UNICODE)
+_MAX_QUERY_TERMS = 32
+_SQL_BATCH = 500
+
+
+class LexicalIndex:
+    """
+    BM25 index over chunk text, built at ingest time next to the dense vectors.
+    Uses SQLite FTS5 (ranking via its built-in bm25()), so it is persistent,
+    shared by every worker on the host and independent of the vector backend.
+    It is not shared across hosts: an API host only has the chunks it ingested
+    (and WAL mode rules out network filesystems), so a multi-host deployment
+    must ingest and query on one host or disable lexical search elsewhere.
+    Point ids and filter fields live in an ordinary indexed table that shares
+    rowids with the FTS table, so tenant filters and deletes never scan the index.
+    """
+
+    def __init__(self, path: str = LEXICAL_INDEX_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f'CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5(text, tokenize="{_TOKENIZER}")')
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunk_meta ("
+            " rowid INTEGER PRIMARY KEY, point_id TEXT UNIQUE NOT NULL, user_id TEXT, api_key TEXT, doc_id TEXT)"
+        )
+        for field in FILTER_FIELDS:
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_chunk_meta_{field} ON chunk_meta({field})")
+        self._conn.commit()
+
+    def add(self, points: list) -> None:
+        """Index points ({"id", "payload"}); re-adding an id replaces its text."""
+        if not points:
+            return
+        with self._lock:
+            self._delete_ids([str(p["id"]) for p in points])
+            for p in points:
+                payload = p["payload"]
+                cursor = self._conn.execute(
+                    "INSERT INTO chunk_meta (point_id, user_id, api_key, doc_id) VALUES (?, ?, ?, ?)",
+                    (str(p["id"]), payload.get("user_id"), payload.get("api_key"), payload.get("doc_id")),
+                )
+                self._conn.execute(
+                    "INSERT INTO chunks (rowid, text) VALUES (?, ?)", (cursor.lastrowid, payload.get("text", ""))
+                )
+            self._conn.commit()
+
+    def _delete_rows(self, where: str, params: list) -> None:
+        rowids = [r[0] for r in self._conn.execute(f"SELECT m.rowid FROM chunk_meta AS m WHERE {where}", params)]
+        for i in range(0, len(rowids), _SQL_BATCH):
+            batch = rowids[i:i + _SQL_BATCH]
+            marks = ",".join("?" * len(batch))
+            self._conn.execute(f"DELETE FROM chunks WHERE rowid IN ({marks})", batch)
+            self._conn.execute(f"DELETE FROM chunk_meta WHERE rowid IN ({marks})", batch)
+
+    def _delete_ids(self, ids: list) -> None:
+        for i in range(0, len(ids), _SQL_BATCH):
+            batch = ids[i:i + _SQL_BATCH]
+            self._delete_rows(f"m.point_id IN ({','.join('?' * len(batch))})", batch)
+
+    def delete(self, ids: list = None, filters: dict = None) -> None:
+        with self._lock:
+            if ids:
+                self._delete_ids([str(i) for i in ids])
+            else:
+                where, params = self._where(filters)
+                if not where:
+                    return
+                self._delete_rows(" AND ".join(where), params)
+            self._conn.commit()
+
+    @staticmethod
+    def _where(filters: dict):
+        where, params = [], []
+        for field, value in clean_filters(filters).items():
+            if field not in FILTER_FIELDS:
+                continue
+            if isinstance(value, list):
+                where.append(f"m.{field} IN ({','.join('?' * len(value))})" if value else "0")
+                params.extend(value)
+            else:
+                where.append(f"m.{field} = ?")
+                params.append(value)
+        return where, params
+
+    @staticmethod
+    def match_expression(query_text: str) -> str:
+        """Any-term FTS5 query; every term is quoted so user text can't inject FTS syntax."""
+        terms = list(dict.fromkeys(t.lower() for t in _TOKEN_RE.findall(query_text or "")))
+        return " OR ".join(f'"{t}"' for t in terms[:_MAX_QUERY_TERMS])
+
+    def search(self, query_text: str, limit: int = 20, filters: dict = None) -> list:
+        """Top-`limit` chunks by BM25, best first, as {"id", "score", "payload"} hits."""
+        expression = self.match_expression(query_text)
+        if not expression:
+            return []
+        where, params = self._where(filters)
+        clauses = " AND ".join(["chunks MATCH ?"] + where)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT m.point_id, m.user_id, m.api_key, m.doc_id, chunks.text, bm25(chunks) AS rank "
+                f"FROM chunks JOIN chunk_meta AS m ON m.rowid = chunks.rowid "
+                f"WHERE {clauses} ORDER BY rank LIMIT ?",
+                [expression, *params, limit],
+            ).fetchall()
+        return [
+            {
+                "id": point_id,
+                # FTS5 bm25() is "lower is better"; flip it so higher means more relevant
+                "score": -rank,
+                "payload": {"user_id": user_id, "api_key": api_key, "doc_id": doc_id, "text": text},
+            }
+            for point_id, user_id, api_key, doc_id, text, rank in rows
+        ]
+
+
+lexical_index = LexicalIndex()
@@ -0,0 +1,251 @@
+# llm_client.py
+import asyncio
+import json
+import random
+
+import httpx
+
+from backend.config import (
+    GROQ_API_KEY,
+    GROQ_ENDPOINT,
+    GROQ_MODEL,
+    LLM_TIMEOUT_SECONDS,
+    LLM_CONNECT_TIMEOUT_SECONDS,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BASE_SECONDS,
+    LLM_MAX_OUTPUT_TOKENS,
+)
+from .llm_scheduler import scheduler, Overloaded
+from .context_packer import count_tokens
+
+
+class LLMError(Exception):
+    """Non-200 answer, failed stream or transport failure talking to the LLM provider."""
+
+    def __init__(self, status_code: int, text: str, retry_after: float = None):
+        super().__init__(f"{status_code} {text}")
+        self.status_code = status_code
+        self.text = text
+        self.retry_after = retry_after
+
+
+def parse_output_text(result: dict) -> str:
+    """Join the `output_text` parts of a Responses API result."""
+    output_texts = [
+        c.get("text").strip()
+        for item in result.get("output", [])
+        for c in item.get("content", [])
+        if c.get("type") == "output_text"
+    ]
+    return " ".join(output_texts).strip()
+
+
+def estimate_tokens(prompt: str, max_output_tokens: int) -> int:
+    """Upper-bound token reservation for a call: the prompt plus the full output budget."""
+    return count_tokens(prompt) + max_output_tokens
+
+
+def usage_tokens(result: dict):
+    """Total tokens a Responses API result reports, or None if it has no usage block."""
+    return (result.get("usage") or {}).get("total_tokens")
+
+
+def transport_error(error: httpx.TransportError) -> LLMError:
+    """Connection failures and timeouts, as an LLMError the endpoints already map."""
+    if isinstance(error, httpx.TimeoutException):
+        return LLMError(504, f"LLM request timed out: {error!r}")
+    return LLMError(502, f"LLM connection failed: {error!r}")
+
+
+def stream_error(event: dict) -> LLMError:
+    """A `response.failed` or `error` stream event as an LLMError."""
+    error = (event.get("response") or {}).get("error") or event.get("error") or event
+    message = error.get("message") if isinstance(error, dict) else str(error)
+    code = error.get("code") if isinstance(error, dict) else None
+    return LLMError(429 if code == "rate_limit_exceeded" else 502, f"{code or 'stream_error'}: {message}")
+
+
+def retry_after_seconds(headers) -> float:
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class GroqClient:
+    """
+    Shared async client for the Groq Responses API.
+    One httpx.AsyncClient keeps connections alive across requests, a
+    semaphore caps how many LLM calls this worker has in flight and the
+    scheduler keeps them under the RPM/TPM limits. 429s are retried with
+    jittered exponential backoff, or after the provider's retry-after.
+    """
+
+    def __init__(self, endpoint: str = GROQ_ENDPOINT, api_key: str = GROQ_API_KEY,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY, max_retries: int = LLM_MAX_RETRIES):
+        self.endpoint = endpoint
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.scheduler = scheduler
+        self._client = None
+        self._semaphore = None
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.retries = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS),
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_CONNECTIONS,
+                    keepalive_expiry=30.0,
+                ),
+                headers={"Authorization": f"Bearer {self.api_key}"},
+            )
+        return self._client
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def build_payload(self, prompt: str, max_output_tokens: int = LLM_MAX_OUTPUT_TOKENS,
+                      temperature: float = 0.2) -> dict:
+        return {
+            "model": GROQ_MODEL,
+            "input": prompt,
+            "temperature": temperature,
+            "max_output_tokens": max_output_tokens,
+        }
+
+    async def _admit(self, reserved: int) -> None:
+        """Wait for scheduler budget, turning a shed or oversized request into an LLMError."""
+        if self.scheduler.tpm and reserved > self.scheduler.tpm:
+            raise LLMError(413, f"Request too large: ~{reserved} tokens, limit {self.scheduler.tpm} per minute")
+        try:
+            await self.scheduler.acquire(reserved)
+        except Overloaded as e:
+            raise LLMError(429, f"rate_limit_exceeded: {e.reason}", retry_after=e.retry_after)
+
+    def _back_off(self, attempt: int, reserved: int, headers) -> None:
+        """Release the rejected reservation and hold the queue before the next attempt."""
+        self.rate_limited += 1
+        self.retries += 1
+        self.scheduler.settle(reserved, 0)
+        delay = retry_after_seconds(headers)
+        if delay is None:
+            delay = random.uniform(0, LLM_RETRY_BASE_SECONDS * 2 ** attempt)  # full jitter
+        else:
+            delay += random.uniform(0, LLM_RETRY_BASE_SECONDS)
+        self.scheduler.pause(delay)
+
+    def _failed(self, reserved: int, error: LLMError) -> LLMError:
+        self.errors += 1
+        self.scheduler.settle(reserved, 0)
+        return error
+
+    async def generate(self, prompt: str, max_output_tokens: int = LLM_MAX_OUTPUT_TOKENS,
+                       temperature: float = 0.2) -> str:
+        """Run one completion and return its text; raises LLMError on a non-200 answer or transport failure."""
+        payload = self.build_payload(prompt, max_output_tokens, temperature)
+        reserved = estimate_tokens(prompt, max_output_tokens)
+        for attempt in range(self.max_retries + 1):
+            await self._admit(reserved)
+            async with self.semaphore:
+                self.in_flight += 1
+                self.requests += 1
+                try:
+                    resp = await self.client.post(self.endpoint, json=payload)
+                except httpx.TransportError as e:
+                    raise self._failed(reserved, transport_error(e))
+                finally:
+                    self.in_flight -= 1
+            if resp.status_code == 429 and attempt < self.max_retries:
+                self._back_off(attempt, reserved, resp.headers)
+                continue
+            break
+        if resp.status_code != 200:
+            raise self._failed(reserved, LLMError(resp.status_code, resp.text,
+                                                  retry_after=retry_after_seconds(resp.headers)))
+        result = resp.json()
+        self.scheduler.settle(reserved, usage_tokens(result))
+        return parse_output_text(result)
+
+    async def stream(self, prompt: str, max_output_tokens: int = LLM_MAX_OUTPUT_TOKENS,
+                     temperature: float = 0.2):
+        """
+        Yield output text deltas as the provider streams them (Responses API SSE).
+        Raises LLMError, possibly after some deltas, when the response fails, the
+        provider sends an error event, or the stream ends before completing.
+        """
+        payload = self.build_payload(prompt, max_output_tokens, temperature)
+        payload["stream"] = True
+        reserved = estimate_tokens(prompt, max_output_tokens)
+        for attempt in range(self.max_retries + 1):
+            await self._admit(reserved)
+            used, completed = None, False
+            async with self.semaphore:
+                self.in_flight += 1
+                self.requests += 1
+                try:
+                    async with self.client.stream("POST", self.endpoint, json=payload) as resp:
+                        if resp.status_code == 429 and attempt < self.max_retries:
+                            self._back_off(attempt, reserved, resp.headers)
+                            continue
+                        if resp.status_code != 200:
+                            raise self._failed(reserved, LLMError(
+                                resp.status_code, (await resp.aread()).decode("utf-8", "replace"),
+                                retry_after=retry_after_seconds(resp.headers)))
+                        async for line in resp.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[len("data:"):].strip()
+                            if data == "[DONE]":
+                                completed = True
+                                break
+                            event = json.loads(data)
+                            kind = event.get("type")
+                            if kind == "response.output_text.delta" and event.get("delta"):
+                                yield event["delta"]
+                            elif kind == "response.completed":
+                                used = usage_tokens(event.get("response") or {})
+                                completed = True
+                                break
+                            elif kind in ("response.failed", "error"):
+                                raise self._failed(reserved, stream_error(event))
+                except httpx.TransportError as e:
+                    raise self._failed(reserved, transport_error(e))
+                finally:
+                    self.in_flight -= 1
+            if not completed:
+                raise self._failed(reserved, LLMError(502, "LLM stream ended before the response completed"))
+            self.scheduler.settle(reserved, used)
+            return
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "retries": self.retries,
+            "scheduler": self.scheduler.stats(),
+        }
+
+
+llm_client = GroqClient()
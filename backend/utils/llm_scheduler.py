@@ -0,0 +1,148 @@
+# llm_scheduler.py
+import asyncio
+import time
+from collections import deque
+
+import numpy as np
+
+from backend.config import LLM_RPM_LIMIT, LLM_TPM_LIMIT, LLM_QUEUE_MAX, LLM_QUEUE_MAX_WAIT_SECONDS
+
+
+class Overloaded(Exception):
+    """The request was shed: the queue is full or its wait would exceed the limit."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """`per_minute` units refilled continuously; the balance may go negative after a correction."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float) -> float:
+        """Seconds until `amount` units are available."""
+        self._refill()
+        missing = amount - self.tokens
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= amount
+
+    def give_back(self, amount: float) -> None:
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class LLMScheduler:
+    """
+    Keeps this worker under the provider's requests-per-minute and
+    tokens-per-minute limits instead of finding out from a 429.
+    Callers queue in FIFO order; only the head of the queue waits on the
+    buckets. A request is shed (Overloaded) when the queue is full or when it
+    would wait longer than `max_wait_seconds`. Token reservations are estimates
+    and are corrected with the real usage once the answer arrives.
+    """
+
+    def __init__(self, rpm: int = LLM_RPM_LIMIT, tpm: int = LLM_TPM_LIMIT, max_queue: int = LLM_QUEUE_MAX,
+                 max_wait_seconds: float = LLM_QUEUE_MAX_WAIT_SECONDS):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self._requests = TokenBucket(rpm) if rpm > 0 else None
+        self._tokens = TokenBucket(tpm) if tpm > 0 else None
+        self._lock = None
+        self._paused_until = 0.0
+        self._waits = deque(maxlen=1000)
+        self.waiting = 0
+        self.granted = 0
+        self.shed = 0
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def _delay(self, tokens: int) -> float:
+        delay = self._paused_until - time.monotonic()
+        if self._requests is not None:
+            delay = max(delay, self._requests.delay(1))
+        if self._tokens is not None:
+            delay = max(delay, self._tokens.delay(tokens))
+        return max(delay, 0.0)
+
+    def _shed(self, reason: str, retry_after: float):
+        self.shed += 1
+        return Overloaded(reason, retry_after)
+
+    async def acquire(self, tokens: int) -> float:
+        """Wait for budget for one request of about `tokens` tokens; returns the seconds waited."""
+        if self.waiting >= self.max_queue:
+            raise self._shed("LLM queue full", self._delay(tokens) or 1.0)
+        started = time.monotonic()
+        deadline = started + self.max_wait_seconds
+        self.waiting += 1
+        try:
+            try:
+                await asyncio.wait_for(self.lock.acquire(), self.max_wait_seconds)
+            except asyncio.TimeoutError:
+                raise self._shed("LLM queue wait too long", self._delay(tokens) or 1.0)
+            try:
+                while True:
+                    delay = self._delay(tokens)
+                    if delay <= 0:
+                        break
+                    if time.monotonic() + delay > deadline:
+                        raise self._shed("LLM rate budget exhausted", delay)
+                    await asyncio.sleep(delay)
+                if self._requests is not None:
+                    self._requests.take(1)
+                if self._tokens is not None:
+                    self._tokens.take(tokens)
+            finally:
+                self.lock.release()
+        finally:
+            self.waiting -= 1
+        waited = time.monotonic() - started
+        self._waits.append(waited)
+        self.granted += 1
+        return waited
+
+    def settle(self, reserved: int, used: int) -> None:
+        """Correct a reservation with the real token usage (0 for a rejected call)."""
+        if self._tokens is not None and used is not None:
+            self._tokens.give_back(reserved - used)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every queued request for `seconds` (the provider asked us to back off)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def stats(self) -> dict:
+        waits_ms = np.asarray(self._waits, dtype=np.float64) * 1000.0
+        return {
+            "rpm_limit": self.rpm,
+            "tpm_limit": self.tpm,
+            "queue_depth": self.waiting,
+            "granted": self.granted,
+            "shed": self.shed,
+            "wait_ms_p50": round(float(np.percentile(waits_ms, 50)), 1) if len(waits_ms) else 0.0,
+            "wait_ms_p95": round(float(np.percentile(waits_ms, 95)), 1) if len(waits_ms) else 0.0,
+            "wait_ms_max": round(float(waits_ms.max()), 1) if len(waits_ms) else 0.0,
+        }
+
+
+scheduler = LLMScheduler()
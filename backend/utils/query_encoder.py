@@ -0,0 +1,137 @@
+# query_encoder.py
+import asyncio
+import threading
+from collections import OrderedDict
+
+from backend.config import QUERY_CACHE_SIZE, QUERY_BATCH_MAX_SIZE, QUERY_BATCH_MAX_WAIT_MS
+from .embedding_engine import engine
+
+
+class QueryVectorCache:
+    """Thread-safe in-process LRU of query text -> vector."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        with self._lock:
+            vector = self._items.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key: str, vector) -> None:
+        with self._lock:
+            self._items[key] = vector
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._items), "hits": self.hits, "misses": self.misses}
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single-query encodes for up to `max_wait_ms` (or until
+    `max_batch_size` are waiting) and runs them through the engine as one batch.
+    """
+
+    def __init__(self, encode_fn, max_batch_size: int, max_wait_ms: float):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = None
+        self._worker = None
+        self.requests = 0
+        self.batches = 0
+
+    async def submit(self, text: str):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._collect())
+        future = loop.create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            # Dispatch without waiting so the next batch can gather meanwhile
+            loop.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch: list):
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        self.requests += len(batch)
+        self.batches += 1
+        try:
+            vectors = await asyncio.get_running_loop().run_in_executor(None, self.encode_fn, texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        by_text = dict(zip(texts, vectors))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(by_text[text])
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
+
+
+query_cache = QueryVectorCache(QUERY_CACHE_SIZE)
+batcher = MicroBatcher(engine.encode, QUERY_BATCH_MAX_SIZE, QUERY_BATCH_MAX_WAIT_MS)
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+async def encode_query(text: str):
+    """Query vector from the LRU, or from a micro-batched encode on a miss."""
+    key = _normalize(text)
+    vector = query_cache.get(key)
+    if vector is None:
+        vector = await batcher.submit(key)
+        query_cache.put(key, vector)
+    return vector
+
+
+def encode_query_sync(text: str):
+    """Blocking variant for callers outside the event loop."""
+    key = _normalize(text)
+    vector = query_cache.get(key)
+    if vector is None:
+        vector = engine.encode([key])[0]
+        query_cache.put(key, vector)
+    return vector
+
+
+def stats() -> dict:
+    return {"cache": query_cache.stats(), "batcher": batcher.stats()}
@@ -0,0 +1,113 @@
+# reranker.py
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.config import RERANK_MODEL_NAME, RERANK_BUDGET_MS, RERANK_CACHE_SIZE
+
+
+class CrossEncoderReranker:
+    """
+    Scores (query, chunk) pairs with a small CPU cross-encoder in one batch.
+    Scores are cached per (query, chunk id). If scoring does not finish within
+    the latency budget the caller gets the original (fused/dense) order back;
+    the late scores still land in the cache for the next identical query.
+    """
+
+    def __init__(self, model_name: str = RERANK_MODEL_NAME, cache_size: int = RERANK_CACHE_SIZE):
+        self.model_name = model_name
+        self.cache_size = cache_size
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # One scoring call at a time: each call is already a full batch
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+        self.calls = 0
+        self.fallbacks = 0
+        self.cache_hits = 0
+        self.pairs_scored = 0
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+
+                    start = time.perf_counter()
+                    self._model = CrossEncoder(self.model_name, device="cpu")
+                    print(f"[rerank] loaded {self.model_name} in {time.perf_counter() - start:.2f}s")
+        return self._model
+
+    def warm_up(self) -> None:
+        self.model.predict([("warm-up", "warm-up")], show_progress_bar=False)
+
+    def _cached(self, key):
+        with self._cache_lock:
+            score = self._cache.get(key)
+            if score is not None:
+                self._cache.move_to_end(key)
+            return score
+
+    def _score(self, query: str, hits: list) -> dict:
+        scores = self.model.predict(
+            [(query, h["payload"]["text"]) for h in hits], batch_size=len(hits), show_progress_bar=False
+        )
+        with self._cache_lock:
+            for hit, score in zip(hits, scores):
+                self._cache[(query, hit["id"])] = float(score)
+                self._cache.move_to_end((query, hit["id"]))
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        self.pairs_scored += len(hits)
+        return {hit["id"]: float(score) for hit, score in zip(hits, scores)}
+
+    async def rerank(self, query: str, hits: list, top_k: int, budget_ms: float = RERANK_BUDGET_MS) -> list:
+        """Best `top_k` hits by cross-encoder score, or the incoming order if over budget."""
+        if not hits:
+            return hits
+        self.calls += 1
+        query = " ".join(query.split())
+        scores, missing = {}, []
+        for hit in hits:
+            score = self._cached((query, hit["id"]))
+            if score is None:
+                missing.append(hit)
+            else:
+                scores[hit["id"]] = score
+        self.cache_hits += len(hits) - len(missing)
+
+        if missing:
+            future = asyncio.get_running_loop().run_in_executor(self._pool, self._score, query, missing)
+            try:
+                scores.update(await asyncio.wait_for(asyncio.shield(future), budget_ms / 1000.0))
+            except asyncio.TimeoutError:
+                self.fallbacks += 1
+                print(f"[rerank] over {budget_ms:.0f}ms budget, keeping retrieval order")
+                return hits[:top_k]
+
+        ranked = sorted(hits, key=lambda h: scores[h["id"]], reverse=True)[:top_k]
+        return [{**h, "rerank_score": scores[h["id"]]} for h in ranked]
+
+    def stats(self) -> dict:
+        with self._cache_lock:
+            cache_entries = len(self._cache)
+        return {
+            "model": self.model_name,
+            "loaded": self.is_loaded,
+            "calls": self.calls,
+            "fallbacks": self.fallbacks,
+            "pairs_scored": self.pairs_scored,
+            "cache_hits": self.cache_hits,
+            "cache_entries": cache_entries,
+        }
+
+
+reranker = CrossEncoderReranker()
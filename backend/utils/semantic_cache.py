@@ -0,0 +1,175 @@
+# semantic_cache.py
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from backend.config import (
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTL_SECONDS,
+    SEMANTIC_CACHE_MAX_PER_TENANT,
+    SEMANTIC_CACHE_MAX_TENANTS,
+    SEMANTIC_CACHE_GENERATIONS_PATH,
+)
+
+
+class _Bucket:
+    """Cached answers of one (tenant, scope): a small matrix of unit query vectors."""
+
+    def __init__(self):
+        self.vectors = []
+        self.answers = []
+        self.expires = []
+        self.last_hit = []
+
+    def drop(self, keep: list) -> None:
+        self.vectors = [self.vectors[i] for i in keep]
+        self.answers = [self.answers[i] for i in keep]
+        self.expires = [self.expires[i] for i in keep]
+        self.last_hit = [self.last_hit[i] for i in keep]
+
+
+class SemanticCache:
+    """
+    Per-tenant answer cache in front of the LLM call.
+    A query is a hit when its embedding is within `threshold` cosine similarity
+    of a cached query for the same tenant and retrieval options (`scope`).
+    Entries expire after `ttl_seconds`; each tenant keeps at most
+    `max_per_tenant` answers (least recently hit go first) and only the
+    `max_tenants` most recently used tenants are kept. Re-embedding a tenant's
+    documents must call invalidate() so stale answers are never served.
+
+    Answers are held per process, but invalidation goes through a per-tenant
+    generation counter in SQLite (shared by every worker on the host): each
+    tenant's answers carry the generation they were computed at, and a
+    lookup that sees a newer one drops them, whichever worker ran the ingest.
+    """
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, ttl_seconds: float = SEMANTIC_CACHE_TTL_SECONDS,
+                 max_per_tenant: int = SEMANTIC_CACHE_MAX_PER_TENANT, max_tenants: int = SEMANTIC_CACHE_MAX_TENANTS,
+                 path: str = SEMANTIC_CACHE_GENERATIONS_PATH):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_per_tenant = max_per_tenant
+        self.max_tenants = max_tenants
+        self._tenants = OrderedDict()  # tenant -> {scope: _Bucket}
+        self._generations = {}         # tenant -> generation its cached answers were computed at
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS generations (tenant TEXT PRIMARY KEY, generation INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def generation(self, tenant: str) -> int:
+        """Current generation of a tenant's documents (bumped by invalidate() in any worker)."""
+        with self._lock:
+            row = self._conn.execute("SELECT generation FROM generations WHERE tenant = ?", (tenant,)).fetchone()
+        return row[0] if row else 0
+
+    def _drop_tenant(self, tenant: str) -> None:
+        if self._tenants.pop(tenant, None) is not None:
+            self.invalidations += 1
+        self._generations.pop(tenant, None)
+
+    def lookup(self, tenant: str, vector, scope: str = "", generation: int = None):
+        """
+        Cached answer for a semantically equivalent query, or None. Pass the
+        `generation` read before retrieval to store() with the new answer.
+        """
+        if generation is None:
+            generation = self.generation(tenant)
+        now = time.time()
+        query = self._unit(vector)
+        with self._lock:
+            if self._generations.get(tenant, generation) != generation:
+                self._drop_tenant(tenant)
+            bucket = self._tenants.get(tenant, {}).get(scope)
+            if bucket is not None:
+                self._tenants.move_to_end(tenant)
+                live = [i for i, exp in enumerate(bucket.expires) if exp > now]
+                if len(live) != len(bucket.expires):
+                    bucket.drop(live)
+                if bucket.vectors:
+                    similarities = np.stack(bucket.vectors) @ query
+                    best = int(np.argmax(similarities))
+                    if similarities[best] >= self.threshold:
+                        bucket.last_hit[best] = now
+                        self.hits += 1
+                        return bucket.answers[best]
+            self.misses += 1
+            return None
+
+    def store(self, tenant: str, vector, answer, scope: str = "", generation: int = None) -> None:
+        """Cache an answer; skipped when the tenant's documents changed since `generation` was read."""
+        current = self.generation(tenant)
+        if generation is not None and generation != current:
+            return
+        now = time.time()
+        with self._lock:
+            if self._generations.get(tenant, current) != current:
+                self._drop_tenant(tenant)
+            self._generations[tenant] = current
+            scopes = self._tenants.setdefault(tenant, {})
+            self._tenants.move_to_end(tenant)
+            bucket = scopes.setdefault(scope, _Bucket())
+            bucket.vectors.append(self._unit(vector))
+            bucket.answers.append(answer)
+            bucket.expires.append(now + self.ttl_seconds)
+            bucket.last_hit.append(now)
+            if len(bucket.vectors) > self.max_per_tenant:
+                keep = sorted(range(len(bucket.vectors)), key=lambda i: bucket.last_hit[i])[1:]
+                bucket.drop(sorted(keep))
+            while len(self._tenants) > self.max_tenants:
+                evicted, _ = self._tenants.popitem(last=False)
+                self._generations.pop(evicted, None)
+
+    def invalidate(self, tenant: str) -> None:
+        """Forget every cached answer of a tenant (its documents changed), in every worker."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO generations (tenant, generation) VALUES (?, 1)"
+                " ON CONFLICT(tenant) DO UPDATE SET generation = generation + 1",
+                (tenant,),
+            )
+            self._conn.commit()
+            self._drop_tenant(tenant)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = sum(len(b.vectors) for scopes in self._tenants.values() for b in scopes.values())
+            lookups = self.hits + self.misses
+            return {
+                "tenants": len(self._tenants),
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "threshold": self.threshold,
+            }
+
+
+def user_tenant(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+def api_key_tenant(api_key: str) -> str:
+    return f"api_key:{api_key}"
+
+
+semantic_cache = SemanticCache()
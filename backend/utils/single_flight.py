@@ -0,0 +1,50 @@
+# single_flight.py
+import asyncio
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form used to spot identical questions."""
+    return " ".join(query.lower().split())
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: the first caller for a key starts the
+    work, every caller that arrives while it is running awaits the same result
+    (or exception). The work runs in its own task, so a caller that disconnects
+    does not cancel it for the others. Keys are forgotten as soon as the work
+    finishes; this is not a cache.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _finished(self, key, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every caller went away
+
+    async def do(self, key, fn):
+        """Await `fn()` once per in-flight `key`, sharing its result with concurrent callers."""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
+
+
+single_flight = SingleFlight()